@@ -1,6 +1,12 @@
 import threading
 import queue
 
+# Plotting/profiling.py hooks when run with PYTHONPATH=Plotting (see its docstring)
+try:
+    from profiling import phase
+except ImportError:
+    from contextlib import nullcontext as phase
+
 SENTINEL = object()
 
 class Pipeline(threading.Thread):
@@ -19,10 +25,28 @@ class Pipeline(threading.Thread):
         pass
 
     def feed(self, fb):
-        pass
+        self.in_q.put(fb)
 
     def stop(self):
-        pass
+        self.stop_event.set()
+        self.in_q.put(SENTINEL)
 
     def run(self):
-        pass
+        names = [f"stage {i} {type(s).__name__}" for i, s in enumerate(self.stages)]
+        for stage in self.stages:
+            stage.open()
+        try:
+            while not self.stop_event.is_set():
+                item = self.in_q.get()
+                if item is SENTINEL:
+                    break
+                for name, stage in zip(names, self.stages):
+                    with phase(name):
+                        item = stage.process(item)
+                if self.out_q is not None:
+                    self.out_q.put(item)
+        finally:
+            for stage in self.stages:
+                stage.close()
+            if self.out_q is not None:
+                self.out_q.put(SENTINEL)
@@ -0,0 +1,310 @@
+import asyncio
+import itertools
+import json
+import queue
+import random
+
+import numpy as np
+
+from Pipeline import SENTINEL
+
+# Rate-accurate telemetry replay for exercising Pipeline threads and
+# streaming roll estimators without hardware.
+#
+# Every source (telemetry CSV, decoded VectorNav .npy, paired video) is a
+# channel with its own recorded timestamps. All channels share one start
+# time and each sample is published at
+#
+#     start + (t_sample - t_first) / speed + jitter
+#
+# computed from the absolute schedule, so timing errors don't accumulate.
+# Subscribers get their own bounded queue; what happens when a subscriber
+# falls behind is chosen per subscriber (block / drop newest / drop oldest),
+# so latency and backpressure problems show up the same way they would on
+# the pad.
+
+
+class Subscriber:
+    def __init__(self, maxsize=1024, policy="drop_oldest"):
+        if policy not in ("block", "drop", "drop_oldest"):
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.queue = asyncio.Queue(maxsize)
+        self.policy = policy
+        self.dropped = 0
+
+    async def put(self, message):
+        if self.policy == "block":
+            await self.queue.put(message)
+            return
+        if self.queue.full():
+            self.dropped += 1
+            # End of stream (None) always gets through, at the cost of the oldest sample
+            if self.policy == "drop" and message is not None:
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class ThreadQueueSubscriber:
+    """Forwards messages into a queue.Queue, e.g. a Pipeline's in_queue.
+    Samples are dropped when the queue is full. End of stream is signalled
+    with Pipeline.SENTINEL and is never dropped: the oldest queued samples
+    are evicted to make room for it.
+    """
+
+    def __init__(self, thread_queue):
+        self.queue = thread_queue
+        self.dropped = 0
+
+    async def put(self, message):
+        if message is None:
+            self._put_sentinel()
+            return
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def _put_sentinel(self):
+        while True:
+            try:
+                self.queue.put_nowait(SENTINEL)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+
+class Channel:
+    def __init__(self, name, times, messages):
+        self.name = name
+        self.times = np.asarray(times, dtype=float)
+        self.messages = messages  # indexable or a callable(i) -> message
+        self.subscribers = []
+        self.published = 0
+        self.lateness = []  # seconds late, per published sample
+
+    def message(self, i):
+        return self.messages(i) if callable(self.messages) else self.messages[i]
+
+
+class ReplayServer:
+    def __init__(self, speed=1.0, jitter=0.0, dropout=0.0, seed=None):
+        """
+        speed:   replay speed factor (2.0 = twice real time)
+        jitter:  std dev of Gaussian publish-time jitter, in seconds of wall time
+        dropout: probability that any one sample is silently dropped
+        """
+        self.speed = speed
+        self.jitter = jitter
+        self.dropout = dropout
+        self.rng = random.Random(seed)
+        self.channels = {}
+
+    # ---- sources ---------------------------------------------------------
+
+    def add_telemetry_csv(self, path, name="telemetry", time_col=None):
+        """Add an FT*_primary/payload style CSV. Messages are dicts of the row."""
+        import pandas as pd
+
+        df = pd.read_csv(path, skipinitialspace=True)
+        if time_col is None:
+            time_col = "time" if "time" in df.columns else "Time (ms)"
+        df = df.sort_values(time_col, kind="stable")
+        records = df.to_dict("records")
+        return self.add_channel(name, df[time_col].to_numpy(float), records)
+
+    def add_telemetry_npy(self, path, name="telemetry", time_field="time_startup", time_scale=1e-9):
+        """Add cached binary telemetry (e.g. the .npy saved by VectorNav.py).
+        time_field is scaled by time_scale to seconds (VectorNav times are ns).
+        """
+        data = np.load(path, mmap_mode="r")
+        times = np.asarray(data[time_field], dtype=float) * time_scale
+
+        def message(i):
+            row = data[i]
+            return {k: row[k].tolist() for k in data.dtype.names}
+
+        return self.add_channel(name, times, message)
+
+    def add_video(self, path, name="video", offset=0.0):
+        """Add a video paced at its recorded frame times.
+        offset (s) shifts the video clock onto the telemetry clock.
+        Messages are {'t', 'frame_index', 'frame'} with frame as a BGR array;
+        frames are decoded in a worker thread just ahead of their publish time.
+        Each frame's time is its decoded timestamp (CAP_PROP_POS_MSEC), or
+        i / fps when the container has none; the frame count is not trusted,
+        the channel runs until decoding fails.
+        """
+        import cv2
+
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise RuntimeError(f"Could not open video file {path}")
+
+        # Times are filled in as frames are decoded; offset is where frame 0 lands
+        channel = self.add_channel(name, [], None)
+        channel.capture = cap
+        channel.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        channel.offset = offset
+        return channel
+
+    def add_channel(self, name, times, messages):
+        channel = Channel(name, times, messages)
+        self.channels[name] = channel
+        return channel
+
+    # ---- subscribers -----------------------------------------------------
+
+    def subscribe(self, channel="telemetry", maxsize=1024, policy="drop_oldest"):
+        sub = Subscriber(maxsize, policy)
+        self.channels[channel].subscribers.append(sub)
+        return sub
+
+    def subscribe_queue(self, thread_queue, channel="telemetry"):
+        sub = ThreadQueueSubscriber(thread_queue)
+        self.channels[channel].subscribers.append(sub)
+        return sub
+
+    async def serve_tcp(self, host="127.0.0.1", port=5555, channel="telemetry"):
+        """Publish a channel as newline-delimited JSON to every TCP client."""
+
+        async def handle(reader, writer):
+            sub = self.subscribe(channel)
+            try:
+                while True:
+                    message = await sub.get()
+                    if message is None:
+                        break
+                    writer.write(json.dumps(message, default=_to_json).encode() + b"\n")
+                    await writer.drain()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+            finally:
+                self.channels[channel].subscribers.remove(sub)
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+    # ---- replay ----------------------------------------------------------
+
+    async def _next_frame(self, channel, i):
+        import cv2
+
+        ok, frame = await asyncio.to_thread(channel.capture.read)
+        if not ok:
+            channel.capture.release()
+            return None
+        pos_ms = channel.capture.get(cv2.CAP_PROP_POS_MSEC)
+        t = channel.offset + (pos_ms / 1e3 if pos_ms > 0 else i / channel.fps)
+        channel.times = np.append(channel.times, t)
+        return {"t": t, "frame_index": i, "frame": frame}
+
+    async def _run_channel(self, channel, start, t_first):
+        loop = asyncio.get_running_loop()
+        is_video = hasattr(channel, "capture")
+
+        for i in itertools.count():
+            if is_video:
+                # Decode every frame (even dropped ones) to keep the capture in step
+                message = await self._next_frame(channel, i)
+                if message is None:
+                    break
+                t = message["t"]
+            elif i < len(channel.times):
+                t = channel.times[i]
+            else:
+                break
+            if self.dropout and self.rng.random() < self.dropout:
+                continue
+
+            target = start + (t - t_first) / self.speed
+            if self.jitter:
+                target += self.rng.gauss(0.0, self.jitter)
+            delay = target - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if not is_video:
+                message = channel.message(i)
+            channel.lateness.append(loop.time() - target)
+            for sub in list(channel.subscribers):
+                await sub.put(message)
+            channel.published += 1
+
+        for sub in list(channel.subscribers):
+            await sub.put(None)  # end of stream (SENTINEL for thread queues)
+
+    async def run(self, lead_in=0.1):
+        """Replay every channel once, in lock step. Returns per-channel stats."""
+        loop = asyncio.get_running_loop()
+        t_first = min(
+            c.offset if hasattr(c, "capture") else c.times[0]
+            for c in self.channels.values()
+            if hasattr(c, "capture") or len(c.times)
+        )
+        start = loop.time() + lead_in
+        await asyncio.gather(*(self._run_channel(c, start, t_first) for c in self.channels.values()))
+        return self.stats()
+
+    def stats(self):
+        out = {}
+        for name, c in self.channels.items():
+            late = np.asarray(c.lateness) if c.lateness else np.zeros(1)
+            out[name] = {
+                "published": c.published,
+                "dropped_by_subscribers": sum(s.dropped for s in c.subscribers),
+                "lateness_p50_ms": float(np.percentile(late, 50) * 1e3),
+                "lateness_p99_ms": float(np.percentile(late, 99) * 1e3),
+                "lateness_max_ms": float(late.max() * 1e3),
+            }
+        return out
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialise {type(value)}")
+
+
+async def _main(args):
+    server = ReplayServer(speed=args.speed, jitter=args.jitter, dropout=args.dropout, seed=args.seed)
+    if args.telemetry.endswith(".npy"):
+        server.add_telemetry_npy(args.telemetry)
+    else:
+        server.add_telemetry_csv(args.telemetry)
+    if args.video:
+        server.add_video(args.video, offset=args.video_offset)
+
+    tcp = await server.serve_tcp(args.host, args.port)
+    print(f"Serving telemetry on {args.host}:{args.port}; waiting {args.wait:.1f} s for subscribers...")
+    await asyncio.sleep(args.wait)
+    async with tcp:
+        stats = await server.run()
+    for name, s in stats.items():
+        print(name, s)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Replay recorded telemetry (and video) at recorded timing")
+    ap.add_argument("telemetry", help="FT*_primary / payload CSV, or a decoded VectorNav .npy")
+    ap.add_argument("--video", help="Paired video to pace at its recorded frame times")
+    ap.add_argument("--video-offset", type=float, default=0.0, help="Video start time on the telemetry clock (s)")
+    ap.add_argument("--speed", type=float, default=1.0, help="Replay speed factor (default 1.0)")
+    ap.add_argument("--jitter", type=float, default=0.0, help="Publish jitter std dev in seconds")
+    ap.add_argument("--dropout", type=float, default=0.0, help="Per-sample dropout probability")
+    ap.add_argument("--seed", type=int, help="Seed for jitter/dropout")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=5555)
+    ap.add_argument("--wait", type=float, default=2.0, help="Seconds to wait for subscribers before starting")
+    asyncio.run(_main(ap.parse_args()))
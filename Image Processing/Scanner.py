@@ -4,6 +4,11 @@ import os
 import csv
 import math
 
+try:
+    from profiling import phase
+except ImportError:
+    from contextlib import nullcontext as phase
+
 class Scanner:
     output_folder = "images/"
 
@@ -19,23 +24,27 @@ class Scanner:
             print(f"Error: Could not open video file {video_path}")
             return
 
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_times = []
+        self.frame_paths = []
         frame_count = 0
         while True:
-            ret, frame = cap.read()
+            with phase("decode"):
+                ret, frame = cap.read()
             if not ret:
                 break
+            # Same timestamp convention as Sync.video_rotation_rate
+            self.frame_times.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 or frame_count / fps)
 
             image_filename = os.path.join(self.output_folder, f"frame_{frame_count:05d}.png")
-            cv2.imwrite(image_filename, frame)
+            with phase("write frame"):
+                cv2.imwrite(image_filename, frame)
+            self.frame_paths.append(image_filename)
             frame_count += 1
 
         cap.release()
 
-        return [
-            Image.open(os.path.join(self.output_folder, f))
-            for f in sorted(os.listdir(self.output_folder))
-            if f.endswith(".png")
-        ]
+        return [Image.open(f) for f in self.frame_paths]
 
 
     def import_csv(self, orientation_path):
@@ -58,21 +67,37 @@ class Scanner:
         return output
     
 
-    def __init__(self, video_path, orientation_path):
+    def __init__(self, video_path, orientation_path, clock=None, imu_times=None):
         # Load all saved images as PIL Images
         self.images = self.import_images(video_path)
 
         # Load orientation data from the CSV file
         self.orientation = self.import_csv(orientation_path)
 
+        # With a Sync.ClockModel (and the IMU time of every orientation row)
+        # each frame gets the IMU row closest to it in time, and frames with
+        # no IMU row nearby are dropped; without one, frame i is paired with row i.
+        if clock is not None:
+            if imu_times is None or len(imu_times) != len(self.orientation):
+                raise ValueError("clock needs imu_times, one per orientation row")
+            rows, valid = clock.imu_rows(self.frame_times, imu_times)
+            if not valid.all():
+                print(f"Warning: {int((~valid).sum())} of {len(valid)} frames have no matching IMU row; dropping them.")
+            keep = [i for i in range(len(rows)) if valid[i]]
+            self.images = [self.images[i] for i in keep]
+            self.frame_paths = [self.frame_paths[i] for i in keep]
+            self.frame_times = [self.frame_times[i] for i in keep]
+            self.orientation = [self.orientation[rows[i]] for i in keep]
+
         self.length = min(len(self.images), len(self.orientation))
 
         if self.length == 0:
             raise RuntimeError("No frames or orientation rows found.")
         if len(self.frame_paths) != len(self.orientation):
-            print(f"Warning: frames ({len(self.frame_paths)}) and IMU rows ({len(self.orientation)}) differ; truncating to {n}.")
+            print(f"Warning: frames ({len(self.frame_paths)}) and IMU rows ({len(self.orientation)}) differ; truncating to {self.length}.")
 
         # ensure both are the same size
+        self.images = self.images[:self.length]
         self.frame_paths = self.frame_paths[:self.length]
         self.orientation = self.orientation[:self.length]
 
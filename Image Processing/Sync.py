@@ -0,0 +1,213 @@
+import cv2
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Camera <-> IMU clock synchronisation.
+#
+# Scanner pairs frame i with IMU row i, which is only right if both clocks
+# start together and tick at exactly the same rate (see the VectorNav
+# Time-Synchronization note in VectorNav Resources/). Here we measure it:
+#
+#   1. derive a roll-rate-like signal from the video: dense optical flow on
+#      heavily downscaled grey frames, reduced to the global rotation about
+#      the image centre (least squares, vectorised over all pixels)
+#   2. resample it and the gyro rate onto one uniform grid
+#   3. coarse offset from one FFT cross-correlation of the whole signals,
+#      then a lag per sliding window, all windows correlated in one batched
+#      FFT, refined to sub-sample with a parabolic fit
+#   4. robust linear fit of lag vs time -> offset + drift (ClockModel)
+#
+# ClockModel.imu_rows(frame_times, imu_times) then replaces the i <-> i pairing
+# and flags frames that fall outside the IMU log;
+# Scanner(video, orientation_csv, clock=model, imu_times=t) uses it directly.
+
+
+class ClockModel:
+    """gyro_time = (1 + drift) * video_time + offset"""
+
+    def __init__(self, offset, drift=0.0, sign=1.0, windows=None):
+        self.offset = offset
+        self.drift = drift
+        self.sign = sign          # -1 if the video rotation is mirrored w.r.t. the gyro axis
+        self.windows = windows    # per-window (time, lag, quality) used in the fit
+
+    def video_to_imu(self, video_times):
+        return (1.0 + self.drift) * np.asarray(video_times, dtype=float) + self.offset
+
+    def imu_rows(self, frame_times, imu_times, tolerance=None):
+        """Index of the IMU row closest in time to each video frame, and a mask
+        of the frames whose closest row is within tolerance seconds (default
+        half the median IMU period). Frames before or after the IMU log get
+        the edge row and valid=False.
+        """
+        imu_times = np.asarray(imu_times, dtype=float)
+        t = self.video_to_imu(frame_times)
+        idx = np.clip(np.searchsorted(imu_times, t), 1, len(imu_times) - 1)
+        left_closer = (t - imu_times[idx - 1]) < (imu_times[idx] - t)
+        rows = idx - left_closer
+        if tolerance is None:
+            tolerance = 0.5 * np.median(np.diff(imu_times))
+        valid = np.abs(imu_times[rows] - t) <= tolerance
+        return rows, valid
+
+    def __repr__(self):
+        return f"ClockModel(offset={self.offset:.4f} s, drift={self.drift * 1e6:.1f} ppm, sign={self.sign:+.0f})"
+
+
+def video_rotation_rate(video_path, width=160, max_frames=None):
+    """Global image rotation rate (deg/s) between consecutive frames.
+    Frames are downscaled to `width` pixels wide before computing flow, which
+    is what keeps this to seconds for a whole flight.
+    Returns (times at the midpoint of each frame pair, rate).
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video file {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    prev = None
+    times, rates = [], []
+    i = 0
+    rx = ry = denom = None
+    while max_frames is None or i < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        t = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 or i / fps
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+        grey = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        if rx is None:
+            ys, xs = np.mgrid[0:grey.shape[0], 0:grey.shape[1]].astype(np.float32)
+            rx = xs - (grey.shape[1] - 1) / 2
+            ry = ys - (grey.shape[0] - 1) / 2
+            denom = float(np.sum(rx * rx + ry * ry))
+
+        if prev is not None:
+            flow = cv2.calcOpticalFlowFarneback(prev, grey, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+            # Small rotation dtheta: v = dtheta * (-ry, rx); least squares over all pixels
+            dtheta = float(np.sum(rx * flow[..., 1] - ry * flow[..., 0])) / denom
+            dt = t - prev_t
+            if dt > 0:
+                times.append((t + prev_t) / 2)
+                rates.append(np.degrees(dtheta) / dt)
+        prev, prev_t = grey, t
+        i += 1
+
+    cap.release()
+    return np.asarray(times), np.asarray(rates)
+
+
+def resample_uniform(t, x, fs, t0=None, t1=None):
+    t0 = t[0] if t0 is None else t0
+    t1 = t[-1] if t1 is None else t1
+    grid = np.arange(t0, t1, 1.0 / fs)
+    return grid, np.interp(grid, t, x)
+
+
+def _normalise(x, axis=-1):
+    x = x - x.mean(axis=axis, keepdims=True)
+    norm = np.linalg.norm(x, axis=axis, keepdims=True)
+    return x / np.where(norm > 0, norm, 1.0)
+
+
+def _xcorr(a, b, max_lag):
+    """Normalised cross-correlation of rows of a and b for lags -max_lag..max_lag.
+    corr[..., max_lag + k] compares a[n] with b[n + k]. One batched rFFT.
+    """
+    n = a.shape[-1]
+    nfft = 1 << int(np.ceil(np.log2(2 * n)))
+    spec = np.conj(np.fft.rfft(_normalise(a), nfft)) * np.fft.rfft(_normalise(b), nfft)
+    full = np.fft.irfft(spec, nfft)
+    return np.concatenate([full[..., nfft - max_lag:], full[..., :max_lag + 1]], axis=-1)
+
+
+def _peak(corr, max_lag):
+    """Sub-sample lag of the maximum of each row (parabolic interpolation) and its height."""
+    k = np.argmax(corr, axis=-1)
+    k_in = np.clip(k, 1, corr.shape[-1] - 2)
+    rows = np.arange(corr.shape[0])
+    y0, y1, y2 = corr[rows, k_in - 1], corr[rows, k_in], corr[rows, k_in + 1]
+    denom = y0 - 2 * y1 + y2
+    frac = np.where(denom != 0, 0.5 * (y0 - y2) / np.where(denom != 0, denom, 1), 0.0)
+    frac = np.where(k == k_in, frac, 0.0)
+    return k - max_lag + frac, corr[rows, k]
+
+
+def estimate_clock(video_t, video_rate, gyro_t, gyro_rate, fs=100.0, window_s=20.0,
+                   step_s=5.0, max_offset_s=30.0, max_drift_lag_s=1.0, min_quality=0.5):
+    """Fit a ClockModel mapping video time onto gyro time.
+    max_offset_s bounds the coarse whole-signal search; max_drift_lag_s is
+    how far each window may move from the coarse offset.
+    """
+    grid_v, v = resample_uniform(video_t, video_rate, fs)
+    grid_g, g = resample_uniform(gyro_t, gyro_rate, fs)
+
+    # Coarse: both signals on their own clocks, one correlation over everything
+    n_pad = max(len(v), len(g))
+    a = np.zeros(n_pad)
+    b = np.zeros(n_pad)
+    a[:len(v)], b[:len(g)] = v, g
+    max_lag = int(min(max_offset_s * fs, n_pad - 1))
+    corr = _xcorr(a[None], b[None], max_lag)[0]
+    sign = 1.0 if corr.max() >= -corr.min() else -1.0
+    coarse_lag, _ = _peak((sign * corr)[None], max_lag)
+    coarse = grid_g[0] - grid_v[0] + coarse_lag[0] / fs
+    v = sign * v
+
+    # Fine: gyro windows re-sampled at the coarse-shifted video times
+    win = int(window_s * fs)
+    step = int(step_s * fs)
+    fine = int(max_drift_lag_s * fs)
+    g_on_v = np.interp(grid_v + coarse, grid_g, g, left=np.nan, right=np.nan)
+    valid = np.isfinite(g_on_v)
+    if valid.sum() < win:
+        raise ValueError("Video and gyro overlap is shorter than one window")
+    lo, hi = np.flatnonzero(valid)[[0, -1]]
+    vv, gg, tt = v[lo:hi + 1], g_on_v[lo:hi + 1], grid_v[lo:hi + 1]
+
+    v_win = sliding_window_view(vv, win)[::step]
+    g_win = sliding_window_view(gg, win)[::step]
+    centres = sliding_window_view(tt, win)[::step].mean(axis=1)
+    lags, quality = _peak(_xcorr(v_win, g_win, fine), fine)
+    lags = coarse + lags / fs
+
+    # Robust linear fit: lag = offset + drift * t, dropping windows > 3 MAD off
+    good = quality >= min_quality
+    if good.sum() < 2:
+        return ClockModel(coarse, 0.0, sign, (centres, lags, quality))
+    for _ in range(3):
+        A = np.stack([np.ones(good.sum()), centres[good]], axis=1)
+        (offset, drift), *_ = np.linalg.lstsq(A, lags[good], rcond=None)
+        resid = lags - (offset + drift * centres)
+        mad = np.median(np.abs(resid[good])) * 1.4826 + 1e-6
+        new_good = (quality >= min_quality) & (np.abs(resid) <= 3 * mad)
+        if new_good.sum() < 2 or np.array_equal(new_good, good):
+            break
+        good = new_good
+    return ClockModel(float(offset), float(drift), sign, (centres, lags, quality))
+
+
+if __name__ == "__main__":
+    import argparse
+    import pandas as pd
+
+    ap = argparse.ArgumentParser(description="Estimate camera-IMU clock offset and drift")
+    ap.add_argument("video", help="Payload video")
+    ap.add_argument("imu", help="IMU CSV")
+    ap.add_argument("--time-col", default="time")
+    ap.add_argument("--gyro-col", default="gyro_roll", help="Gyro rate about the camera axis (deg/s)")
+    ap.add_argument("--width", type=int, default=160, help="Downscaled frame width for optical flow")
+    ap.add_argument("--window", type=float, default=20.0, help="Correlation window (s)")
+    ap.add_argument("--max-offset", type=float, default=30.0, help="Largest clock offset searched (s)")
+    args = ap.parse_args()
+
+    vt, vr = video_rotation_rate(args.video, width=args.width)
+    imu = pd.read_csv(args.imu, skipinitialspace=True)
+    model = estimate_clock(vt, vr, imu[args.time_col].to_numpy(float), imu[args.gyro_col].to_numpy(float),
+                           window_s=args.window, max_offset_s=args.max_offset)
+    print(model)
+    centres, lags, quality = model.windows
+    for c, l, q in zip(centres, lags, quality):
+        print(f"  t={c:8.2f} s  lag={l:+.4f} s  quality={q:.2f}")
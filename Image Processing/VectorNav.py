@@ -0,0 +1,314 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+
+# VectorNav binary output protocol (see VectorNav Resources/VN200 Specific Info/VN200-ICD):
+#
+#   0xFA | groups (u8) | one u16 field mask per active group | payload | CRC16 (big endian)
+#
+# The CRC is CRC-16-CCITT (poly 0x1021, init 0) over everything after the sync
+# byte; running it over the packet *including* the CRC gives 0.
+#
+# Only the Common group (group 1) is decoded here. That is the group we
+# configure on the VN-200/VN-300 for flight logging, and every field in it
+# has a fixed size, so a given output configuration always produces
+# packets of the same length. That is what lets us decode whole batches of
+# packets as a 2D byte array instead of one struct.unpack per field.
+
+SYNC = 0xFA
+COMMON_GROUP = 0x01
+
+# bit -> (name, numpy dtype, shape)
+COMMON_FIELDS = [
+    ("time_startup", "<u8", ()),
+    ("time_gps", "<u8", ()),
+    ("time_syncin", "<u8", ()),
+    ("ypr", "<f4", (3,)),
+    ("quaternion", "<f4", (4,)),
+    ("angular_rate", "<f4", (3,)),
+    ("position", "<f8", (3,)),
+    ("velocity", "<f4", (3,)),
+    ("accel", "<f4", (3,)),
+    ("imu", "<f4", (6,)),
+    ("mag_pres", "<f4", (5,)),
+    ("delta_theta", "<f4", (7,)),
+    ("ins_status", "<u2", ()),
+    ("sync_in_cnt", "<u4", ()),
+    ("time_gps_pps", "<u8", ()),
+]
+
+
+def _crc_table():
+    table = np.zeros(256, dtype=np.uint16)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table
+
+
+CRC_TABLE = _crc_table()
+
+# Keeps replay pump tasks referenced until they finish
+_background = set()
+
+
+def crc16(data):
+    """CRC-16-CCITT of a bytes-like object (scalar version, for single packets)."""
+    crc = 0
+    for b in bytes(data):
+        crc = ((crc << 8) & 0xFFFF) ^ int(CRC_TABLE[((crc >> 8) ^ b) & 0xFF])
+    return crc
+
+
+def crc16_rows(rows):
+    """CRC-16-CCITT of every row of a (n_packets, n_bytes) uint8 array at once.
+    Loops over the packet length (tens of bytes), never over packets.
+    """
+    crc = np.zeros(len(rows), dtype=np.uint16)
+    for col in range(rows.shape[1]):
+        crc = (crc << 8) ^ CRC_TABLE[(crc >> 8) ^ rows[:, col]]
+    return crc
+
+
+class BinaryLayout:
+    """One binary output configuration: which Common group fields are on."""
+
+    def __init__(self, fields):
+        names = [f[0] for f in COMMON_FIELDS]
+        unknown = set(fields) - set(names)
+        if unknown:
+            raise ValueError(f"Unknown Common group fields: {sorted(unknown)}")
+
+        # Payload order is bit order, whatever order the caller listed them in
+        self.mask = 0
+        dtype = []
+        for bit, (name, base, shape) in enumerate(COMMON_FIELDS):
+            if name in fields:
+                self.mask |= 1 << bit
+                dtype.append((name, base, shape))
+        self.dtype = np.dtype(dtype)
+
+        self.header = bytes([SYNC, COMMON_GROUP]) + self.mask.to_bytes(2, "little")
+        self.packet_size = len(self.header) + self.dtype.itemsize + 2
+
+    def encode(self, records):
+        """Encode a structured array of records into packed binary packets.
+        Used to build replay files; vectorized the same way as decoding.
+        """
+        records = np.ascontiguousarray(records, dtype=self.dtype)
+        n = len(records)
+        rows = np.empty((n, self.packet_size), dtype=np.uint8)
+        rows[:, :len(self.header)] = np.frombuffer(self.header, dtype=np.uint8)
+        rows[:, len(self.header):-2] = records.view(np.uint8).reshape(n, -1)
+        crc = crc16_rows(rows[:, 1:-2])
+        rows[:, -2] = crc >> 8
+        rows[:, -1] = crc & 0xFF
+        return rows.tobytes()
+
+
+class VectorNavReader:
+    """Incremental packet framer/decoder for one BinaryLayout.
+
+    feed() takes raw bytes as they arrive (any chunking) and returns the
+    packets completed so far as a structured array. The returned array is a
+    view into a preallocated buffer that is reused on the next feed(), so
+    copy it if it has to outlive the call.
+    """
+
+    def __init__(self, layout, capacity=1024):
+        self.layout = layout
+        self._header = np.frombuffer(layout.header, dtype=np.uint8)
+        self._size = layout.packet_size
+
+        # Raw byte buffer: unconsumed bytes live in _raw[:_fill]
+        self._raw = np.empty(max(capacity, 4) * self._size, dtype=np.uint8)
+        self._fill = 0
+        self._out = np.empty(capacity, dtype=layout.dtype)
+
+        self.packets = 0
+        self.bad_packets = 0
+        self.skipped_bytes = 0
+
+    def _append(self, data):
+        data = np.frombuffer(data, dtype=np.uint8)
+        need = self._fill + len(data)
+        if need > len(self._raw):
+            grown = np.empty(max(need, 2 * len(self._raw)), dtype=np.uint8)
+            grown[:self._fill] = self._raw[:self._fill]
+            self._raw = grown
+        self._raw[self._fill:need] = data
+        self._fill = need
+
+    def _find_header(self, pos):
+        """Position of the next packet header at or after pos, or -1."""
+        raw = self._raw[:self._fill]
+        h = len(self._header)
+        candidates = pos + np.flatnonzero(raw[pos:self._fill - h + 1] == SYNC)
+        for c in candidates:
+            if np.array_equal(raw[c:c + h], self._header):
+                return int(c)
+        return -1
+
+    def feed(self, data):
+        self._append(data)
+        raw = self._raw
+        size, h = self._size, len(self._header)
+        pos = 0
+        count = 0
+
+        while True:
+            start = self._find_header(pos)
+            if start < 0:
+                # Keep a possible partial header at the end of the buffer
+                keep_from = max(pos, self._fill - h + 1)
+                self.skipped_bytes += keep_from - pos
+                pos = keep_from
+                break
+            self.skipped_bytes += start - pos
+
+            n = (self._fill - start) // size
+            if n == 0:
+                pos = start
+                break
+
+            rows = raw[start:start + n * size].reshape(n, size)
+            ok = np.all(rows[:, :h] == self._header, axis=1)
+            ok &= crc16_rows(rows[:, 1:]) == 0
+            good = n if ok.all() else int(np.argmin(ok))
+
+            if good:
+                if count + good > len(self._out):
+                    grown = np.empty(max(count + good, 2 * len(self._out)), dtype=self._out.dtype)
+                    grown[:count] = self._out[:count]
+                    self._out = grown
+                payload = np.ascontiguousarray(rows[:good, h:-2])
+                self._out[count:count + good] = payload.view(self._out.dtype).ravel()
+                count += good
+
+            pos = start + good * size
+            if good < n:
+                # Bad CRC or lost alignment: drop the sync byte and resynchronise
+                self.bad_packets += 1
+                pos += 1
+
+        # Compact unconsumed bytes to the front of the buffer
+        rest = self._fill - pos
+        raw[:rest] = raw[pos:self._fill].copy()
+        self._fill = rest
+        self.packets += count
+        return self._out[:count]
+
+
+class VectorNavStream:
+    """Asyncio ingest of a VectorNav binary stream.
+
+    Any asyncio.StreamReader works as the source; open_device() and
+    open_replay() build one for a serial port / pty and a recorded file.
+    on_batch is called with each decoded batch (see VectorNavReader.feed
+    for the buffer reuse rule).
+    """
+
+    def __init__(self, layout, on_batch, chunk_size=16384):
+        self.reader = VectorNavReader(layout)
+        self.on_batch = on_batch
+        self.chunk_size = chunk_size
+
+    async def run(self, stream):
+        while True:
+            data = await stream.read(self.chunk_size)
+            if not data:
+                break
+            batch = self.reader.feed(data)
+            if len(batch):
+                self.on_batch(batch)
+        return self.reader.packets
+
+    @staticmethod
+    async def open_device(path, baudrate=None):
+        """StreamReader over a serial device or pty (Unix), set to raw mode."""
+        import termios
+        import tty
+
+        loop = asyncio.get_running_loop()
+        fd = os.open(path, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+        if os.isatty(fd):
+            tty.setraw(fd)
+            if baudrate:
+                attrs = termios.tcgetattr(fd)
+                speed = getattr(termios, f"B{baudrate}")
+                attrs[4] = attrs[5] = speed
+                termios.tcsetattr(fd, termios.TCSANOW, attrs)
+
+        reader = asyncio.StreamReader(limit=1 << 20)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader),
+                                     os.fdopen(fd, "rb", buffering=0))
+        return reader
+
+    @staticmethod
+    async def open_replay(path, bytes_per_second=None, chunk_size=4096):
+        """StreamReader fed from a recorded binary file.
+        With bytes_per_second the file is paced like the real port
+        (e.g. 921600 baud -> 92160 B/s), otherwise it is read flat out.
+        """
+        reader = asyncio.StreamReader(limit=1 << 20)
+
+        async def pump():
+            start = time.monotonic()
+            sent = 0
+            with open(path, "rb") as f:
+                while chunk := f.read(chunk_size):
+                    reader.feed_data(chunk)
+                    sent += len(chunk)
+                    if bytes_per_second:
+                        delay = start + sent / bytes_per_second - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    else:
+                        await asyncio.sleep(0)
+            reader.feed_eof()
+
+        task = asyncio.get_running_loop().create_task(pump())
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+        return reader
+
+
+async def _main(args):
+    layout = BinaryLayout(args.fields)
+    received = []
+
+    def on_batch(batch):
+        received.append(batch.copy())
+
+    stream = VectorNavStream(layout, on_batch)
+    if os.path.isfile(args.source):
+        source = await VectorNavStream.open_replay(args.source, args.replay_rate)
+    else:
+        source = await VectorNavStream.open_device(args.source, args.baud)
+
+    start = time.perf_counter()
+    packets = await stream.run(source)
+    elapsed = time.perf_counter() - start
+    print(f"{packets} packets in {elapsed:.2f} s ({packets / max(elapsed, 1e-9):.0f} packets/s), "
+          f"{stream.reader.bad_packets} bad packets, {stream.reader.skipped_bytes} bytes skipped")
+
+    if args.output and received:
+        np.save(args.output, np.concatenate(received))
+        print(f"Saved decoded packets to {args.output}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Ingest a VectorNav binary output stream (device, pty or recorded file)")
+    ap.add_argument("source", help="Serial device / pty path, or a recorded binary file to replay")
+    ap.add_argument("--fields", nargs="+", default=["time_startup", "ypr", "angular_rate", "accel"],
+                    help="Common group fields enabled in the sensor's binary output config")
+    ap.add_argument("--baud", type=int, help="Set the serial baud rate")
+    ap.add_argument("--replay-rate", type=float, help="Pace file replay at this many bytes/s")
+    ap.add_argument("-o", "--output", help="Save decoded packets to this .npy file")
+    asyncio.run(_main(ap.parse_args()))
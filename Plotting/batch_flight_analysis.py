@@ -0,0 +1,245 @@
+"""
+Batch flight analysis over every flight log matching a glob.
+Usage: run from the repository root, e.g.
+
+    python Plotting/batch_flight_analysis.py "Plotting/Data/*.csv"
+
+Each log is processed in its own worker process (one per core by default).
+The script runs the standard analyses from the single-flight scripts:
+  - flight state segmentation (state, start/end time, duration)
+  - main-phase roll rate and roll acceleration statistics (Savitzky-Golay,
+    same settings as max_roll_plotting.py / generate_flight.py)
+  - peak roll acceleration
+  - dominant frequencies of the main-phase roll acceleration
+and writes one consolidated CSV with a row per flight, plus a second CSV
+with every state segment of every flight. With --plots DIR a decimated
+roll-rate figure per flight is also rendered headlessly in the pool.
+
+Both AltOS logs (FT*_primary.csv: time/state_name/gyro_roll) and the
+drop-test logs (3_15_drop_1.csv: Time (ms)/Stage/IMU AngVeloY) are supported.
+"""
+
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks, savgol_filter
+from scipy.fft import rfft, rfftfreq
+
+from decimation import FigureJob, export_figures, plot_decimated
+from flight_states import StateIndex
+import profiling
+from profiling import phase
+
+DT = 0.01  # Resample interval (seconds)
+SGF_WINDOW = 20  # Savitzky-Golay filter window length
+SGF_POLYORDER = 3  # Savitzky-Golay polynomial order
+N_FREQS = 3  # Number of dominant frequencies to report
+MAX_FREQ = 20.0  # Ignore spectral peaks above this (Hz)
+
+
+def load_flight(csv_path):
+    """Read a flight log and normalise it to time/state_name/roll columns.
+    Returns a DataFrame sorted by time with duplicate timestamps dropped.
+    Raises KeyError if the log has no recognisable time or roll column.
+    """
+    df = pd.read_csv(csv_path, skipinitialspace=True)
+
+    if 'time' in df.columns:
+        time_col = 'time'
+    elif 'Time (ms)' in df.columns:
+        time_col = 'Time (ms)'
+    else:
+        raise KeyError("Neither 'time' nor 'Time (ms)' found in dataframe")
+
+    if 'gyro_roll' in df.columns:
+        roll_col = 'gyro_roll'
+    elif 'IMU AngVeloY' in df.columns:
+        roll_col = 'IMU AngVeloY'
+    else:
+        raise KeyError("Neither 'gyro_roll' nor 'IMU AngVeloY' found in dataframe")
+
+    if 'state_name' in df.columns:
+        state = df['state_name'].astype(str).str.strip()
+    elif 'Stage' in df.columns:
+        state = df['Stage'].astype(str).str.strip()
+    else:
+        state = pd.Series('unknown', index=df.index)
+
+    out = pd.DataFrame({
+        'time': df[time_col].astype(float),
+        'state_name': state,
+        'roll': df[roll_col].astype(float),
+    })
+    out = out.drop_duplicates('time', keep='first').sort_values('time', kind='stable')
+    return out.reset_index(drop=True)
+
+
+def main_phase(df, states):
+    """Return the main-parachute rows, or the whole log if there is no main state."""
+    rows = states.samples(lambda s: 'main' in s.lower())
+    if len(rows):
+        return df.iloc[rows]
+    return df
+
+
+def resample(time, values, dt=DT):
+    """Linearly resample values onto a uniform grid with spacing dt."""
+    t_new = np.arange(time[0], time[-1], dt)
+    return t_new, np.interp(t_new, time, values)
+
+
+def dominant_frequencies(signal, dt=DT, n=N_FREQS, max_freq=MAX_FREQ):
+    """Return the n strongest spectral peaks of signal below max_freq as (frequency, amplitude) pairs.
+    Peaks are local maxima of the magnitude spectrum, so neighbouring bins of
+    one broad peak are not reported as separate frequencies.
+    """
+    if len(signal) < 2:
+        return []
+    magnitude = np.abs(rfft(signal - np.mean(signal))) / len(signal) * 2
+    freqs = rfftfreq(len(signal), dt)
+    band = (freqs > 0) & (freqs <= max_freq)
+    freqs, magnitude = freqs[band], magnitude[band]
+    # Zero padding lets a maximum in the first or last bin count as a peak
+    peaks, _ = find_peaks(np.r_[0.0, magnitude, 0.0])
+    peaks -= 1
+    top = peaks[np.argsort(magnitude[peaks])[::-1][:n]]
+    return [(float(freqs[i]), float(magnitude[i])) for i in top]
+
+
+def analyze_flight(csv_path):
+    """Run the standard analyses on one flight log.
+    Returns (summary dict, segments DataFrame). Runs inside a worker process.
+    """
+    with phase('load'):
+        df = load_flight(csv_path)
+    with phase('segment'):
+        states = StateIndex.from_frame(df, state_col='state_name')
+        segments = states.to_frame()
+        segments.insert(0, 'flight', Path(csv_path).stem)
+
+    with phase('resample'):
+        main = main_phase(df, states)
+        t, roll = resample(main['time'].to_numpy(), main['roll'].to_numpy())
+    window = min(SGF_WINDOW, len(roll))
+    if window <= SGF_POLYORDER:
+        raise ValueError(f"Main phase too short to analyse ({len(roll)} samples)")
+    with phase('filter'):
+        roll_dot = savgol_filter(roll, window_length=window, polyorder=SGF_POLYORDER,
+                                 deriv=1, delta=DT)
+
+    summary = {
+        'flight': Path(csv_path).stem,
+        'path': str(csv_path),
+        'samples': len(df),
+        'duration_s': df['time'].iloc[-1] - df['time'].iloc[0],
+        'states': ' > '.join(segments['state']),
+        'main_start_s': t[0],
+        'main_duration_s': t[-1] - t[0],
+        'roll_mean': np.mean(roll),
+        'roll_std': np.std(roll),
+        'roll_max_abs': np.max(np.abs(roll)),
+        'roll_accel_mean': np.mean(roll_dot),
+        'roll_accel_std': np.std(roll_dot),
+        'roll_accel_rms': np.sqrt(np.mean(roll_dot ** 2)),
+        'peak_roll_accel': roll_dot[np.argmax(np.abs(roll_dot))],
+        'peak_roll_accel_time_s': t[np.argmax(np.abs(roll_dot))],
+    }
+    with phase('fft'):
+        peaks = dominant_frequencies(roll_dot)
+    for i, (freq, amp) in enumerate(peaks, start=1):
+        summary[f'freq_{i}_hz'] = freq
+        summary[f'freq_{i}_amp'] = amp
+
+    return summary, segments
+
+
+def render_flight(csv_path):
+    """Roll rate vs time with state bands for one log (used for headless export)."""
+    import matplotlib.pyplot as plt
+
+    df = load_flight(csv_path)
+    states = StateIndex.from_frame(df, state_col='state_name')
+    t = df['time'].to_numpy()
+
+    fig, ax = plt.subplots(figsize=(10, 4))
+    colors = plt.cm.tab20.colors
+    for i, seg in enumerate(states):
+        ax.axvspan(t[seg.start], t[min(seg.end, len(t) - 1)], color=colors[i % len(colors)], alpha=0.2)
+    plot_decimated(ax, t, df['roll'], color='black', linewidth=0.8)
+    ax.set_xlabel('Time [s]')
+    ax.set_ylabel('Roll Rate [°/s]')
+    ax.set_title(Path(csv_path).stem)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+def run_batch(paths, workers=None):
+    """Analyse every path in a process pool.
+    Returns (summary DataFrame, segments DataFrame); failed logs are reported
+    in the summary's 'error' column instead of aborting the batch.
+    """
+    summaries, segments = [], []
+    with ProcessPoolExecutor(max_workers=workers, initializer=profiling.worker_init) as pool:
+        futures = {pool.submit(profiling.in_worker, analyze_flight, p): p for p in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                (summary, segs), snap = future.result()
+            except Exception as e:
+                print(f"  {path}: FAILED ({e})")
+                summaries.append({'flight': Path(path).stem, 'path': str(path), 'error': str(e)})
+                continue
+            profiling.merge(snap)
+            print(f"  {path}: {summary['samples']} samples, peak roll accel {summary['peak_roll_accel']:.1f} °/s²")
+            summaries.append(summary)
+            segments.append(segs)
+
+    summary_df = pd.DataFrame(summaries).sort_values('flight').reset_index(drop=True)
+    segments_df = pd.concat(segments, ignore_index=True) if segments else pd.DataFrame()
+    return summary_df, segments_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the standard flight analyses over many logs in parallel')
+    parser.add_argument('patterns', nargs='+', help='Glob(s) of flight CSVs, e.g. "Plotting/Data/FT*_primary.csv"')
+    parser.add_argument('-o', '--output', default='Plotting/Data/flight_summary.csv', help='Summary CSV path (default Plotting/Data/flight_summary.csv)')
+    parser.add_argument('--segments', help='State segment CSV path (default <output>_segments.csv)')
+    parser.add_argument('--plots', help='Also export a roll-rate PNG per flight into this directory')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.patterns for p in glob.glob(pattern, recursive=True)})
+    if not paths:
+        print(f"No files matched {args.patterns}")
+        return
+
+    print(f"Analysing {len(paths)} flight logs on {args.workers or os.cpu_count()} workers...")
+    summary_df, segments_df = run_batch(paths, workers=args.workers)
+
+    out_path = Path(args.output)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    summary_df.to_csv(out_path, index=False)
+    print('Saved summary to', out_path)
+
+    seg_path = Path(args.segments) if args.segments else out_path.with_name(out_path.stem + '_segments.csv')
+    segments_df.to_csv(seg_path, index=False)
+    print('Saved state segments to', seg_path)
+
+    if args.plots:
+        # Only flights that analysed cleanly; the others are already reported
+        ok = summary_df['error'].isna() if 'error' in summary_df else pd.Series(True, index=summary_df.index)
+        jobs = [FigureJob(render_flight, {'csv_path': p}, Path(args.plots) / f'{Path(p).stem}_roll.png')
+                for p in summary_df.loc[ok, 'path']]
+        with phase('plot'):
+            saved = export_figures(jobs, workers=args.workers)
+        print(f'Saved {sum(s is not None for s in saved)} plots to', args.plots)
+
+
+if __name__ == '__main__':
+    main()
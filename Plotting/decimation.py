@@ -0,0 +1,197 @@
+"""
+Screen-resolution decimation for large telemetry plots.
+
+matplotlib draws every vertex it is given, so a multi-hour or high-rate IMU
+log costs time and memory proportional to its length even though only a
+few thousand pixels are visible. The helpers here reduce each series to
+about one bucket per horizontal pixel before plotting:
+
+  - 'minmax': keep the min and max sample of every bucket (in time order).
+    Preserves spikes exactly, output is at most 2 points per pixel.
+  - 'lttb':   Largest-Triangle-Three-Buckets, one point per bucket. Looks
+    closer to the raw trace for smooth signals.
+
+Both work on sample positions, so x may be floats, datetimes or anything
+indexable. Usage:
+
+    from decimation import plot_decimated
+    plot_decimated(ax, t, roll, label='roll')
+
+On interactive figures the line is re-decimated for the visible range on
+every zoom or pan, so no raw samples are lost. For headless batch export of
+many figures use export_figures() with a list of FigureJob entries; each
+figure is rendered with the Agg backend in a worker process.
+"""
+
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import profiling
+
+DEFAULT_BUCKETS = 2000  # Used when the axes width is not known yet
+
+FigureJob = namedtuple("FigureJob", ["render", "kwargs", "output", "dpi"])
+FigureJob.__new__.__defaults__ = ({}, None, 150)
+
+
+def minmax_indices(y, n_buckets):
+    """Indices of the min and max sample of each of n_buckets equal-size buckets.
+    Returned in increasing order so the decimated trace keeps its shape.
+    """
+    y = np.asarray(y)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    size = math.ceil(n / n_buckets)
+    full = (n // size) * size
+    blocks = y[:full].reshape(-1, size)
+    offsets = np.arange(0, full, size)
+    lo = offsets + np.argmin(blocks, axis=1)
+    hi = offsets + np.argmax(blocks, axis=1)
+    idx = [lo, hi]
+
+    if full < n:
+        tail = y[full:]
+        idx.append(np.array([full + np.argmin(tail), full + np.argmax(tail)]))
+
+    # Always keep the end points so the x-range is unchanged
+    idx.append(np.array([0, n - 1]))
+    return np.unique(np.concatenate(idx))
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling to n_out points.
+    x must be numeric (datetimes are converted to int64 by the caller).
+    The loop runs once per output point, never per input sample.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Bucket edges for the n - 2 interior samples, first/last kept as-is
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    # Bucket means are the "third point" of each triangle; computed up front
+    counts = np.diff(edges)
+    x_mean = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / np.maximum(counts, 1)
+    y_mean = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / np.maximum(counts, 1)
+    x_mean = np.r_[x_mean[1:], x[-1]]
+    y_mean = np.r_[y_mean[1:], y[-1]]
+
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        xs, ys = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - x_mean[i]) * (ys - y[a]) - (x[a] - xs) * (y_mean[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def _as_numeric(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64)
+    if x.dtype == object:
+        # tz-aware pandas timestamps come through as objects
+        import pandas as pd
+        return pd.to_datetime(x).asi8
+    return x
+
+
+def decimate(x, y, n_buckets=DEFAULT_BUCKETS, method="minmax"):
+    """Return (x, y) reduced to about n_buckets buckets."""
+    if method == "minmax":
+        idx = minmax_indices(y, n_buckets)
+    elif method == "lttb":
+        idx = lttb_indices(_as_numeric(x), y, n_buckets)
+    else:
+        raise ValueError(f"Unknown decimation method: {method}")
+    x = x.to_numpy() if hasattr(x, "to_numpy") else np.asarray(x)
+    y = y.to_numpy() if hasattr(y, "to_numpy") else np.asarray(y)
+    return x[idx], y[idx]
+
+
+def pixel_width(ax):
+    """Width of ax in device pixels (falls back to DEFAULT_BUCKETS)."""
+    try:
+        width = ax.get_window_extent().width
+    except Exception:
+        return DEFAULT_BUCKETS
+    return max(1, int(round(width))) if width else DEFAULT_BUCKETS
+
+
+def plot_decimated(ax, x, y, *args, method="minmax", **kwargs):
+    """ax.plot(x, y, ...) with the series first reduced to the axes' pixel width.
+    The full series is kept and the line is re-decimated for the visible
+    range whenever the x-limits change, so zooming in on an interactive
+    figure gets back to the raw samples. x must be sorted.
+    """
+    x = x.to_numpy() if hasattr(x, "to_numpy") else np.asarray(x)
+    y = y.to_numpy() if hasattr(y, "to_numpy") else np.asarray(y)
+    xd, yd = decimate(x, y, pixel_width(ax), method=method)
+    lines = ax.plot(xd, yd, *args, **kwargs)
+    line = lines[0]
+    x_axis = []  # x in axis units, converted on first use (needs the units set by plot)
+
+    def on_xlim_changed(ax):
+        if not x_axis:
+            try:
+                x_axis.append(np.asarray(ax.convert_xunits(x), dtype=float))
+            except (TypeError, ValueError):
+                x_axis.append(None)
+        if x_axis[0] is None:
+            return
+        lo, hi = ax.get_xlim()
+        # One sample either side so the line runs off the edges of the axes
+        start = max(np.searchsorted(x_axis[0], lo, side="left") - 1, 0)
+        end = min(np.searchsorted(x_axis[0], hi, side="right") + 1, len(x))
+        xs, ys = decimate(x[start:end], y[start:end], pixel_width(ax), method=method)
+        line.set_data(xs, ys)
+
+    ax.callbacks.connect("xlim_changed", on_xlim_changed)
+    return lines
+
+
+def _render(job):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig = job.render(**job.kwargs)
+    out = Path(job.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(out, dpi=job.dpi)
+    plt.close(fig)
+    return str(out)
+
+
+def export_figures(jobs, workers=None):
+    """Render and save every FigureJob headlessly in a process pool.
+    job.render must be a module-level function (so it can be pickled) that
+    takes job.kwargs and returns a Figure. Returns the saved paths in job
+    order, with None for jobs that failed (reported instead of aborting).
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=profiling.worker_init) as pool:
+        futures = [pool.submit(_render, job) for job in jobs]
+        saved = []
+        for job, future in zip(jobs, futures):
+            try:
+                saved.append(future.result())
+            except Exception as e:
+                print(f"  {job.output}: FAILED ({e})")
+                saved.append(None)
+    return saved
@@ -0,0 +1,274 @@
+"""
+Persistent multi-flight catalog with state and time indexes.
+Usage: run from the repository root, e.g.
+
+    python Plotting/flight_catalog.py ingest "Plotting/Data/*.csv"
+    python Plotting/flight_catalog.py query --state main --min-peak-roll 200
+    python Plotting/flight_catalog.py query --state main --columns time gyro_roll --head 5
+
+Each log is ingested once into a columnar store (one .npy per column per
+flight) plus two small catalog-wide tables:
+  - catalog.json:  per-flight metadata (serial, flight number, UTC date from
+                   the year..second columns, GPS pad location, source file)
+  - segments.npy:  every state segment of every flight with precomputed
+                   roll stats (peak |roll rate|, mean roll rate, duration)
+
+Cross-flight questions like "all main segments with peak roll rate over X"
+are answered from segments.npy alone. Reading the data of a hit only maps
+the needed columns (np.load(mmap_mode='r')) and slices the rows, located
+with a sparse time index (every TIME_STRIDE-th timestamp), so query cost
+depends on the result size, not on the size of the archive.
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from batch_flight_analysis import load_flight
+from flight_states import StateIndex, build_timestamps, DATETIME_COLUMNS
+from profiling import phase
+
+DEFAULT_CATALOG = 'Plotting/Catalog'
+TIME_STRIDE = 256  # One sparse time index entry per this many samples
+
+# flight and state widths here are minimums; segment_dtype() widens them to fit
+SEGMENT_DTYPE = np.dtype([
+    ('flight', 'U32'),
+    ('state', 'U16'),
+    ('start', 'i8'),
+    ('end', 'i8'),
+    ('t_start', 'f8'),
+    ('t_end', 'f8'),
+    ('duration', 'f8'),
+    ('peak_roll', 'f8'),
+    ('mean_roll', 'f8'),
+])
+
+
+def segment_dtype(flight_width, state_width):
+    """SEGMENT_DTYPE with the flight and state fields at least this wide."""
+    widths = {'flight': max(flight_width, SEGMENT_DTYPE['flight'].itemsize // 4),
+              'state': max(state_width, SEGMENT_DTYPE['state'].itemsize // 4)}
+    return np.dtype([(name, f'U{widths[name]}' if name in widths else SEGMENT_DTYPE[name])
+                     for name in SEGMENT_DTYPE.names])
+
+
+def _column_file(name):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name.strip()) + '.npy'
+
+
+def flight_metadata(raw, csv_path):
+    """Metadata for one raw (un-normalised) log DataFrame."""
+    meta = {'source': str(csv_path), 'stem': Path(csv_path).stem}
+
+    for key in ('serial', 'flight'):
+        if key in raw.columns:
+            meta[key] = int(raw[key].iloc[0])
+
+    if set(DATETIME_COLUMNS) <= set(raw.columns):
+        stamps = build_timestamps(raw).dropna()
+        if len(stamps):
+            meta['date'] = stamps.iloc[0].isoformat()
+
+    # Pad location: first fix with enough satellites (AltOS), else first non-zero GPS (drop logs)
+    lat_col = 'latitude' if 'latitude' in raw.columns else 'GPS Latitude'
+    lon_col = 'longitude' if 'longitude' in raw.columns else 'GPS Longitude'
+    if lat_col in raw.columns and lon_col in raw.columns:
+        fix = (raw[lat_col] != 0) & (raw[lon_col] != 0)
+        if 'nsat' in raw.columns:
+            fix &= raw['nsat'] >= 4
+        if fix.any():
+            row = raw[fix].iloc[0]
+            meta['pad_lat'] = float(row[lat_col])
+            meta['pad_lon'] = float(row[lon_col])
+    return meta
+
+
+def flight_id(meta):
+    if 'serial' in meta and 'flight' in meta:
+        return f"{meta['serial']}_{meta['flight']}"
+    return meta['stem']
+
+
+class FlightCatalog:
+    """Columnar on-disk archive of flight logs."""
+
+    def __init__(self, root=DEFAULT_CATALOG):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        meta_path = self.root / 'catalog.json'
+        self.flights = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        seg_path = self.root / 'segments.npy'
+        self.segment_table = np.load(seg_path) if seg_path.exists() else np.empty(0, SEGMENT_DTYPE)
+        self._time_index = {}
+
+    # ---- ingest ----------------------------------------------------------
+
+    def _already_ingested(self, csv_path):
+        st = os.stat(csv_path)
+        for meta in self.flights.values():
+            if os.path.abspath(meta['source']) == os.path.abspath(csv_path) \
+                    and meta.get('size') == st.st_size and meta.get('mtime') == st.st_mtime:
+                return True
+        return False
+
+    def ingest(self, csv_path, force=False):
+        """Add one log to the catalog. Returns its flight id, or None if it was already in."""
+        if not force and self._already_ingested(csv_path):
+            return None
+
+        raw = pd.read_csv(csv_path, skipinitialspace=True)
+        raw.columns = [c.lstrip('#') for c in raw.columns]
+        meta = flight_metadata(raw, csv_path)
+        st = os.stat(csv_path)
+        meta.update(size=st.st_size, mtime=st.st_mtime)
+        fid = flight_id(meta)
+
+        # Normalised view (time/state_name/roll) drives the indexes; apply the
+        # same de-duplication and ordering to the raw columns so rows line up
+        norm = load_flight(csv_path)
+        time_col = 'time' if 'time' in raw.columns else 'Time (ms)'
+        raw = raw.drop_duplicates(time_col, keep='first').sort_values(time_col, kind='stable')
+        raw = raw.reset_index(drop=True)
+
+        out = self.root / 'flights' / fid
+        out.mkdir(parents=True, exist_ok=True)
+        columns = []
+        for col in raw.columns:
+            values = pd.to_numeric(raw[col], errors='coerce')
+            if values.notna().any():
+                np.save(out / _column_file(col), values.to_numpy(float))
+                columns.append(col)
+        t = norm['time'].to_numpy(float)
+        roll = norm['roll'].to_numpy(float)
+        np.save(out / 'time.npy', t)
+        np.save(out / 'roll.npy', roll)
+        np.save(out / 'time_index.npy', t[::TIME_STRIDE])
+        meta['columns'] = sorted(set(columns) | {'time', 'roll'})
+        meta['samples'] = len(t)
+
+        states = StateIndex.from_frame(norm, state_col='state_name')
+        # Size the string fields from the data so ids and states are never cut short
+        old = self.segment_table
+        dtype = segment_dtype(max(len(fid), old.dtype['flight'].itemsize // 4),
+                              max([len(str(seg.state)) for seg in states] + [old.dtype['state'].itemsize // 4]))
+        segs = np.empty(len(states), dtype)
+        for i, seg in enumerate(states):
+            r = roll[seg.start:seg.end]
+            segs[i] = (fid, seg.state, seg.start, seg.end, seg.t_start, seg.t_end,
+                       seg.t_end - seg.t_start, np.max(np.abs(r)), np.mean(r))
+
+        old = old.astype(dtype)
+        self.segment_table = np.concatenate([old[old['flight'] != fid], segs])
+        self.flights[fid] = meta
+        self._time_index.pop(fid, None)
+        self._save()
+        return fid
+
+    def _save(self):
+        np.save(self.root / 'segments.npy', self.segment_table)
+        (self.root / 'catalog.json').write_text(json.dumps(self.flights, indent=2))
+
+    # ---- queries ---------------------------------------------------------
+
+    def segments(self, state=None, flight=None, min_peak_roll=None, t_from=None, t_to=None):
+        """Filter the segment table (no flight data is read)."""
+        seg = self.segment_table
+        mask = np.ones(len(seg), dtype=bool)
+        if state is not None:
+            mask &= seg['state'] == state
+        if flight is not None:
+            mask &= seg['flight'] == flight
+        if min_peak_roll is not None:
+            mask &= seg['peak_roll'] >= min_peak_roll
+        if t_from is not None:
+            mask &= seg['t_end'] >= t_from
+        if t_to is not None:
+            mask &= seg['t_start'] <= t_to
+        return seg[mask]
+
+    def column(self, flight, name):
+        """Memory-mapped column of one flight."""
+        return np.load(self.root / 'flights' / flight / _column_file(name), mmap_mode='r')
+
+    def rows_between(self, flight, t0, t1):
+        """Row range [start, end) of flight with t0 <= time <= t1.
+        Uses the sparse time index, then touches at most two TIME_STRIDE
+        blocks of the mapped time column.
+        """
+        if flight not in self._time_index:
+            self._time_index[flight] = np.load(self.root / 'flights' / flight / 'time_index.npy')
+        sparse = self._time_index[flight]
+        time = self.column(flight, 'time')
+
+        def locate(t, side):
+            block = max(np.searchsorted(sparse, t, side=side) - 1, 0)
+            lo = block * TIME_STRIDE
+            hi = min(lo + 2 * TIME_STRIDE, len(time))
+            return lo + int(np.searchsorted(time[lo:hi], t, side=side))
+
+        return locate(t0, 'left'), locate(t1, 'right')
+
+    def read(self, flight, columns, t0=None, t1=None, start=None, end=None):
+        """Read columns of one flight for a time range or row range as a dict of arrays."""
+        if start is None and end is None and (t0 is not None or t1 is not None):
+            start, end = self.rows_between(flight, -np.inf if t0 is None else t0,
+                                           np.inf if t1 is None else t1)
+        sl = slice(start, end)
+        return {c: np.asarray(self.column(flight, c)[sl]) for c in columns}
+
+    def read_segment(self, segment, columns):
+        return self.read(segment['flight'], columns, start=int(segment['start']), end=int(segment['end']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-flight catalog: ingest logs once, query across flights')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG, help=f'Catalog directory (default {DEFAULT_CATALOG})')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    ing = sub.add_parser('ingest', help='Ingest flight logs')
+    ing.add_argument('patterns', nargs='+', help='Glob(s) of flight CSVs')
+    ing.add_argument('--force', action='store_true', help='Re-ingest logs already in the catalog')
+
+    q = sub.add_parser('query', help='Query state segments across flights')
+    q.add_argument('--state', help='State name, e.g. main')
+    q.add_argument('--flight', help='Flight id')
+    q.add_argument('--min-peak-roll', type=float, help='Only segments whose peak |roll rate| is at least this')
+    q.add_argument('--columns', nargs='+', help='Also read these columns for every hit')
+    q.add_argument('--head', type=int, default=3, help='Rows of column data to print per hit (default 3)')
+    args = parser.parse_args()
+
+    catalog = FlightCatalog(args.catalog)
+
+    if args.command == 'ingest':
+        paths = sorted({p for pattern in args.patterns for p in glob.glob(pattern)})
+        for p in paths:
+            try:
+                with phase('ingest'):
+                    fid = catalog.ingest(p, force=args.force)
+            except KeyError as e:
+                print(f"  {p}: skipped ({e})")
+                continue
+            print(f"  {p}: {'ingested as ' + fid if fid else 'already in catalog'}")
+        print(f"Catalog has {len(catalog.flights)} flights, {len(catalog.segment_table)} segments")
+        return
+
+    with phase('query'):
+        hits = catalog.segments(args.state, args.flight, args.min_peak_roll)
+    print(pd.DataFrame(hits).to_string(index=False) if len(hits) else 'No matching segments')
+    if args.columns:
+        for seg in hits:
+            with phase('read'):
+                data = catalog.read_segment(seg, args.columns)
+            print(f"\n{seg['flight']} {seg['state']} [{seg['t_start']:.2f}, {seg['t_end']:.2f}] s")
+            print(pd.DataFrame(data).head(args.head).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
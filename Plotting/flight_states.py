@@ -0,0 +1,129 @@
+"""
+Flight state segment index shared by the Plotting scripts.
+
+Instead of masking the whole frame every time a script wants "the main
+phase" or "the samples in state 7", the state column is run-length encoded
+once into (state, start, end) segments with NumPy. Queries then only touch
+the segment table:
+
+    idx = StateIndex.from_frame(df)           # uses state_name
+    t0, t1 = idx.time_range('main')
+    main = df.iloc[idx.samples('main')]
+    main = df.iloc[idx.samples(lambda s: 'main' in s.lower())]
+
+    idx7 = StateIndex.from_frame(df, state_col='state')
+    rows = idx7.samples(7)
+
+Segment start/end are sample positions (end exclusive), so they can be used
+directly with iloc or to slice NumPy arrays.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+DATETIME_COLUMNS = ["year", "month", "day", "hour", "minute", "second"]
+
+Segment = namedtuple("Segment", ["state", "start", "end", "t_start", "t_end"])
+
+
+def build_timestamps(df):
+    """Combine the year..second columns into UTC timestamps in one vectorized step.
+    Rows with invalid dates become NaT (same behaviour as the old row-wise apply).
+    """
+    parts = df[DATETIME_COLUMNS].apply(pd.to_numeric, errors="coerce")
+    return pd.to_datetime(parts, errors="coerce", utc=True)
+
+
+class StateIndex:
+    """Run-length encoded flight state segments of one log."""
+
+    def __init__(self, states, time=None):
+        states = np.asarray(states)
+        n = len(states)
+        self.time = np.arange(n, dtype=float) if time is None else np.asarray(time)
+
+        if n == 0:
+            self.states = states[:0]
+            self.starts = np.empty(0, dtype=np.intp)
+            self.ends = np.empty(0, dtype=np.intp)
+        else:
+            self.starts = np.flatnonzero(np.r_[True, states[1:] != states[:-1]])
+            self.ends = np.r_[self.starts[1:], n]
+            self.states = states[self.starts]
+        self.n_samples = n
+
+    @classmethod
+    def from_frame(cls, df, state_col=None, time_col="time"):
+        """Build the index from a DataFrame.
+        state_col defaults to 'state_name' (AltOS logs) or 'Stage' (drop logs).
+        Non-numeric states (object or pandas string dtype) become stripped
+        strings, with missing values as '', so ' main' and 'main' match and
+        string predicates never see a float NaN.
+        """
+        if state_col is None:
+            state_col = "state_name" if "state_name" in df.columns else "Stage"
+        states = df[state_col]
+        if not pd.api.types.is_numeric_dtype(states):
+            states = states.fillna("").astype(str).str.strip()
+        time = df[time_col].to_numpy() if time_col in df.columns else None
+        return cls(states.to_numpy(), time)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        for state, start, end in zip(self.states, self.starts, self.ends):
+            yield Segment(state, int(start), int(end), self.time[start], self.time[end - 1])
+
+    def _match(self, state):
+        # state may be a value or a predicate over state values; predicates
+        # only run once per segment, not per sample.
+        if callable(state):
+            return np.array([bool(state(s)) for s in self.states], dtype=bool)
+        return self.states == state
+
+    def segments(self, state=None):
+        """Return the segments (optionally only those in state) as a list of Segment."""
+        if state is None:
+            return list(self)
+        return [seg for seg, hit in zip(self, self._match(state)) if hit]
+
+    def has(self, state):
+        return bool(np.any(self._match(state)))
+
+    def samples(self, state):
+        """Sample positions of every row in state, in order."""
+        hit = self._match(state)
+        if not hit.any():
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([np.arange(s, e) for s, e in zip(self.starts[hit], self.ends[hit])])
+
+    def count(self, state):
+        """Number of samples in state."""
+        hit = self._match(state)
+        return int(np.sum(self.ends[hit] - self.starts[hit]))
+
+    def time_range(self, state):
+        """(first time, last time) spent in state, or None if the state never occurs."""
+        hit = np.flatnonzero(self._match(state))
+        if len(hit) == 0:
+            return None
+        return self.time[self.starts[hit[0]]], self.time[self.ends[hit[-1]] - 1]
+
+    def state_at(self, position):
+        """State of the sample at position (vectorized over arrays of positions)."""
+        seg = np.searchsorted(self.starts, position, side="right") - 1
+        return self.states[seg]
+
+    def to_frame(self):
+        """Segment table as a DataFrame: state, start, end, t_start, t_end, samples."""
+        return pd.DataFrame({
+            "state": self.states,
+            "start": self.starts,
+            "end": self.ends,
+            "t_start": self.time[self.starts] if len(self) else self.time[:0],
+            "t_end": self.time[self.ends - 1] if len(self) else self.time[:0],
+            "samples": self.ends - self.starts,
+        })
@@ -4,6 +4,8 @@ import numpy as np
 from scipy.signal import savgol_filter, stft, istft
 from scipy.fft import rfft, irfft, rfftfreq
 
+from profiling import checkpoint
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -23,11 +25,13 @@ STFT_OVERLAP = 0.75  # overlap between windows
 # LOAD AND PREPROCESS DATA
 # ============================================================================
 print("Loading and preprocessing data...")
+checkpoint('load')
 df = pd.read_csv(INPUT_CSV)
 df = df.set_index('time')
 df = df[~df.index.duplicated(keep='first')]
 
 # Resample to uniform time intervals
+checkpoint('resample')
 t_new = np.arange(df.index.min(), df.index.max(), DT)
 df = df.reindex(df.index.union(t_new)).interpolate('index').loc[t_new]
 df = df.reset_index()
@@ -44,6 +48,7 @@ print(f"Time range: {time[0]:.2f} to {time[-1]:.2f} seconds")
 # COMPUTE ROLL ACCELERATION FROM REAL DATA
 # ============================================================================
 print("\nComputing roll acceleration...")
+checkpoint('filter')
 roll_smooth = savgol_filter(roll, window_length=SGF_WINDOW, polyorder=SGF_POLYORDER)
 roll_dot = savgol_filter(roll, window_length=SGF_WINDOW, polyorder=SGF_POLYORDER, 
                          deriv=1, delta=DT)
@@ -54,6 +59,7 @@ print(f"Max roll acceleration: {max(np.abs(roll_dot)):.2f} °/s²")
 # COMPUTE STFT (Short-Time Fourier Transform)
 # ============================================================================
 print("\nComputing STFT for nonstationary analysis...")
+checkpoint('stft')
 nperseg = STFT_WINDOW_SIZE
 noverlap = int(nperseg * STFT_OVERLAP)
 
@@ -69,6 +75,7 @@ print(f"Frequency resolution: {f_stft[1] - f_stft[0]:.3f} Hz")
 # NONSTATIONARY BOOTSTRAP: GENERATE SYNTHETIC SIGNALS
 # ============================================================================
 print(f"\nGenerating {NUM_SYNTHETIC} synthetic profiles using nonstationary bootstrap...")
+checkpoint('bootstrap')
 
 import os
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -125,6 +132,7 @@ print("\nGeneration complete!")
 # VISUALIZATION
 # ============================================================================
 print("\nGenerating plots...")
+checkpoint('plot')
 
 fig = plt.figure(figsize=(12, 12))
 
@@ -179,6 +187,7 @@ plt.colorbar(im2, ax=ax5, label='Magnitude')
 
 plt.tight_layout()
 plt.savefig(f'{OUTPUT_DIR}synthetic_analysis_spectrogram.png', dpi=150)
+checkpoint(None)
 print(f"Plot saved: {OUTPUT_DIR}synthetic_analysis_spectrogram.png")
 plt.show()
 
@@ -0,0 +1,360 @@
+"""
+Live ground-station roll dashboard.
+Usage: run from the repository root, e.g.
+
+    python Plotting/live_dashboard.py --tail Plotting/Data/live.csv
+    python Plotting/live_dashboard.py --socket 127.0.0.1:5555     # e.g. Image Processing/Replay.py
+
+Unlike the post-flight plot scripts nothing is reloaded or redrawn from
+scratch. Each channel lives in a fixed-size NumPy ring buffer, new samples
+go through causal streaming filters (Butterworth low-pass and
+Savitzky-Golay derivative, with their filter state carried between
+batches), and the figure is updated with blitting: only the line data and
+state bands are redrawn, against a fixed "seconds before now" x axis. The
+rolling spectrum is refreshed on its own slower timer. Memory and CPU per
+frame are constant however long the pad wait or descent lasts.
+
+Sources run in a background thread and hand batches over through a
+bounded queue: --tail follows a growing CSV, --socket reads
+newline-delimited JSON samples from a local TCP server. Column names are
+picked up from the first batch: time/gyro_roll/state_name for AltOS logs,
+Time (ms)/IMU AngVeloY/Stage for the drop logs.
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+from matplotlib.patches import Rectangle
+from matplotlib.transforms import blended_transform_factory
+from scipy.signal import butter, savgol_coeffs, sosfilt, sosfilt_zi, lfilter
+
+from profiling import phase
+
+TIME_COLUMNS = ['time', 'Time (ms)']
+ROLL_COLUMNS = ['gyro_roll', 'IMU AngVeloY']
+STATE_COLUMNS = ['state_name', 'Stage']
+WINDOW_S = 30.0  # Seconds of history shown
+MAX_STATE_BANDS = 16  # Band artists kept in the pool
+
+
+class RingBuffer:
+    """Fixed-capacity float buffer with a contiguous, copy-free view of the latest data.
+    Every sample is written twice (at i and i + capacity) so the newest
+    `capacity` samples are always one contiguous slice.
+    """
+
+    def __init__(self, capacity, dtype=float):
+        self.capacity = capacity
+        self._data = np.full(2 * capacity, np.nan, dtype=dtype)
+        self._head = 0  # index of the oldest sample in the view
+        self.count = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)[-self.capacity:]
+        k = len(values)
+        if k == 0:
+            return
+        pos = (self._head + min(self.count, self.capacity)) % self.capacity
+        idx = (pos + np.arange(k)) % self.capacity
+        self._data[idx] = values
+        self._data[idx + self.capacity] = values
+        self.count += k
+        if self.count > self.capacity:
+            self._head = (pos + k) % self.capacity
+            self.count = self.capacity
+
+    def view(self):
+        return self._data[self._head:self._head + self.count]
+
+    def last(self, n):
+        v = self.view()
+        return v[max(0, len(v) - n):]
+
+
+class StreamingFilters:
+    """Causal low-pass and derivative that keep their state between batches."""
+
+    def __init__(self, fs, cutoff=5.0, order=4, sgf_window=21, sgf_polyorder=3):
+        self.sos = butter(order, cutoff / (0.5 * fs), btype='low', output='sos')
+        self.zi = None
+        # Savitzky-Golay first derivative as a causal FIR (delayed by window // 2 samples)
+        self.deriv = savgol_coeffs(sgf_window, sgf_polyorder, deriv=1, delta=1.0 / fs, use='conv')
+        self.deriv_zi = np.zeros(len(self.deriv) - 1)
+
+    def __call__(self, x):
+        if self.zi is None:
+            self.zi = sosfilt_zi(self.sos) * x[0]
+        smooth, self.zi = sosfilt(self.sos, x, zi=self.zi)
+        d, self.deriv_zi = lfilter(self.deriv, 1.0, smooth, zi=self.deriv_zi)
+        return smooth, d
+
+
+def tail_csv(path, out, stop, poll_s=0.02):
+    """Follow a growing CSV and push column batches ({name: list}) into out.
+    The dashboard may start before the logger: wait for the file to exist
+    and for a complete header line before reading any rows.
+    """
+    while not os.path.exists(path):
+        if stop.wait(poll_s):
+            return
+    with open(path) as f:
+        header_line = ''
+        while not header_line.endswith('\n'):
+            chunk = f.readline()
+            if not chunk and stop.wait(poll_s):
+                return
+            header_line += chunk
+        header = [h.strip().lstrip('#') for h in header_line.split(',')]
+        partial = ''
+        while not stop.is_set():
+            chunk = f.read()
+            if not chunk:
+                time.sleep(poll_s)
+                continue
+            lines = (partial + chunk).split('\n')
+            partial = lines.pop()
+            rows = [[v.strip() for v in line.split(',')] for line in lines if line.strip()]
+            rows = [r for r in rows if len(r) == len(header)]
+            if rows:
+                _put(out, {name: [r[i] for r in rows] for i, name in enumerate(header)})
+
+
+def socket_source(host, port, out, stop):
+    """Read newline-delimited JSON samples from a TCP server and push batches into out."""
+    with socket.create_connection((host, port)) as sock:
+        sock.settimeout(0.1)
+        partial = b''
+        while not stop.is_set():
+            try:
+                data = sock.recv(65536)
+            except socket.timeout:
+                continue
+            if not data:
+                break
+            lines = (partial + data).split(b'\n')
+            partial = lines.pop()
+            samples = [json.loads(line) for line in lines if line.strip()]
+            if samples:
+                _put(out, {k: [s.get(k) for s in samples] for k in samples[0]})
+
+
+def _put(out, batch):
+    # Never let a slow UI make the reader block: drop the oldest batch instead
+    while True:
+        try:
+            out.put_nowait(batch)
+            return
+        except queue.Full:
+            try:
+                out.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class Dashboard:
+    def __init__(self, fs=100.0, window_s=WINDOW_S, cutoff=5.0, spectrum_s=10.0, roll_col=None):
+        self.fs = fs
+        self.window_s = window_s
+        self.roll_col = roll_col
+        self.time_col = self.state_col = None
+        capacity = int(window_s * fs * 1.5)
+        self.t = RingBuffer(capacity)
+        self.raw = RingBuffer(capacity)
+        self.smooth = RingBuffer(capacity)
+        self.deriv = RingBuffer(capacity)
+        self.filters = StreamingFilters(fs, cutoff=cutoff)
+        self.spectrum_n = int(spectrum_s * fs)
+        self.inbox = queue.Queue(maxsize=256)
+        self.stop = threading.Event()
+
+        # State segments as (state, t_start); only the ones still on screen are kept
+        self.states = []
+
+        self.fig, (self.ax_rate, self.ax_deriv, self.ax_spec) = plt.subplots(3, 1, figsize=(10, 8))
+        self.ax_rate.set_xlim(-window_s, 0)
+        self.ax_rate.set_ylim(-100, 100)
+        self.ax_rate.set_ylabel('Roll Rate [°/s]')
+        self.ax_deriv.set_xlim(-window_s, 0)
+        self.ax_deriv.set_ylim(-500, 500)
+        self.ax_deriv.set_ylabel('Roll Accel [°/s²]')
+        self.ax_deriv.set_xlabel('Time before now [s]')
+        self.ax_spec.set_xlim(0, min(20.0, fs / 2))
+        self.ax_spec.set_ylim(0, 50)
+        self.ax_spec.set_xlabel('Frequency [Hz]')
+        self.ax_spec.set_ylabel('|Roll Rate|')
+        for ax in (self.ax_rate, self.ax_deriv, self.ax_spec):
+            ax.grid(True, alpha=0.3)
+
+        self.line_raw, = self.ax_rate.plot([], [], color='grey', linestyle=':', animated=True, label='raw')
+        self.line_smooth, = self.ax_rate.plot([], [], color='black', animated=True, label=f'low-pass {cutoff} Hz')
+        self.line_deriv, = self.ax_deriv.plot([], [], color='orange', animated=True)
+        self.line_spec, = self.ax_spec.plot([], [], animated=True)
+        self.ax_rate.legend(loc='upper left')
+
+        trans = blended_transform_factory(self.ax_rate.transData, self.ax_rate.transAxes)
+        colors = plt.cm.tab20.colors
+        self.bands = []
+        for i in range(MAX_STATE_BANDS):
+            rect = Rectangle((0, 0), 0, 1, transform=trans, color=colors[i % len(colors)],
+                             alpha=0.2, visible=False, animated=True)
+            self.ax_rate.add_patch(rect)
+            label = self.ax_rate.text(0, 0.95, '', transform=trans, ha='center', va='top',
+                                      fontsize=8, animated=True)
+            self.bands.append((rect, label))
+        self.artists = [self.line_raw, self.line_smooth, self.line_deriv, self.line_spec] + \
+                       [a for pair in self.bands for a in pair]
+
+    # ---- data ------------------------------------------------------------
+
+    def _ingest(self):
+        """Drain the inbox into the ring buffers. Returns True if anything arrived."""
+        got = False
+        while True:
+            try:
+                batch = self.inbox.get_nowait()
+            except queue.Empty:
+                return got
+            if self.time_col is None:
+                self._pick_columns(batch)
+            t = np.asarray(batch.get(self.time_col, []), dtype=float)
+            x = np.asarray(batch.get(self.roll_col, []), dtype=float)
+            if len(t) == 0 or len(t) != len(x):
+                continue
+            # A NaN would stay in the filter state for good
+            ok = np.isfinite(t) & np.isfinite(x)
+            if not ok.all():
+                t, x = t[ok], x[ok]
+                if len(t) == 0:
+                    continue
+            got = True
+            smooth, deriv = self.filters(x)
+            self.t.extend(t)
+            self.raw.extend(x)
+            self.smooth.extend(smooth)
+            self.deriv.extend(deriv)
+
+            states = batch.get(self.state_col)
+            if states:
+                states = np.asarray([str(s).strip() for s in states])[ok]
+                change = np.flatnonzero(np.r_[True, states[1:] != states[:-1]])
+                for i in change:
+                    if not self.states or self.states[-1][0] != states[i]:
+                        self.states.append((states[i], t[i]))
+                # Forget segments that ended before the visible window
+                while len(self.states) > 1 and self.states[1][1] < t[-1] - self.window_s:
+                    self.states.pop(0)
+                del self.states[:-MAX_STATE_BANDS]
+
+    def _pick_columns(self, batch):
+        def first(options):
+            return next((c for c in options if c in batch), None)
+        self.time_col = first(TIME_COLUMNS)
+        self.roll_col = self.roll_col or first(ROLL_COLUMNS)
+        self.state_col = first(STATE_COLUMNS)
+
+    def _rescale(self, ax, y):
+        """Grow the y-limits if the data left them; returns True if a full redraw is needed."""
+        finite = y[np.isfinite(y)]
+        if not len(finite):
+            return False
+        lo, hi = ax.get_ylim()
+        if finite.min() >= lo and finite.max() <= hi:
+            return False
+        span = max(abs(finite.min()), abs(finite.max())) * 1.2
+        ax.set_ylim(-span, span)
+        return True
+
+    # ---- drawing ---------------------------------------------------------
+
+    def update(self, _frame):
+        with phase('ingest'):
+            fresh = self._ingest()
+        if not fresh or self.t.count == 0:
+            return self.artists
+
+        t = self.t.view()
+        now = t[-1]
+        x = t - now
+        self.line_raw.set_data(x, self.raw.view())
+        self.line_smooth.set_data(x, self.smooth.view())
+        self.line_deriv.set_data(x, self.deriv.view())
+
+        ends = [s[1] for s in self.states[1:]] + [now]
+        for i, (rect, label) in enumerate(self.bands):
+            if i < len(self.states):
+                name, start = self.states[i]
+                x0 = max(start - now, -self.window_s)
+                x1 = ends[i] - now
+                rect.set_x(x0)
+                rect.set_width(max(x1 - x0, 0))
+                rect.set_visible(True)
+                label.set_position(((x0 + x1) / 2, 0.95))
+                label.set_text(name)
+                label.set_visible(True)
+            else:
+                rect.set_visible(False)
+                label.set_visible(False)
+
+        if self._rescale(self.ax_rate, self.raw.view()) | self._rescale(self.ax_deriv, self.deriv.view()):
+            # Limits changed: the cached background is stale, take one full redraw
+            self.fig.canvas.draw_idle()
+        return self.artists
+
+    def update_spectrum(self):
+        y = self.smooth.last(self.spectrum_n)
+        if len(y) < 16:
+            return
+        with phase('spectrum'):
+            y = (y - y.mean()) * np.hanning(len(y))
+            mag = np.abs(np.fft.rfft(y)) / len(y) * 4  # x2 one-sided, x2 Hann gain
+            freqs = np.fft.rfftfreq(len(y), 1.0 / self.fs)
+        self.line_spec.set_data(freqs, mag)
+        if mag.max() > self.ax_spec.get_ylim()[1]:
+            self.ax_spec.set_ylim(0, mag.max() * 1.2)
+            self.fig.canvas.draw_idle()
+
+    def run(self, source, *source_args, interval_ms=50, spectrum_every_ms=1000):
+        reader = threading.Thread(target=source, args=(*source_args, self.inbox, self.stop), daemon=True)
+        reader.start()
+        self._anim = FuncAnimation(self.fig, self.update, interval=interval_ms, blit=True,
+                                   cache_frame_data=False)
+        self._spec_timer = self.fig.canvas.new_timer(interval=spectrum_every_ms)
+        self._spec_timer.add_callback(self.update_spectrum)
+        self._spec_timer.start()
+        plt.tight_layout()
+        try:
+            plt.show()
+        finally:
+            self.stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live roll-rate dashboard over streamed telemetry')
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument('--tail', help='Follow a growing telemetry CSV')
+    src.add_argument('--socket', help='host:port of a newline-delimited JSON telemetry server')
+    parser.add_argument('--rate', type=float, default=100.0, help='Nominal telemetry rate in Hz (default 100)')
+    parser.add_argument('--window', type=float, default=WINDOW_S, help=f'Seconds of history shown (default {WINDOW_S:g})')
+    parser.add_argument('--cutoff', type=float, default=5.0, help='Low-pass cutoff in Hz (default 5)')
+    parser.add_argument('--col', help='Roll rate column (default gyro_roll or IMU AngVeloY)')
+    parser.add_argument('--fps', type=float, default=20.0, help='Redraw rate (default 20)')
+    args = parser.parse_args()
+
+    dash = Dashboard(fs=args.rate, window_s=args.window, cutoff=args.cutoff, roll_col=args.col)
+    if args.tail:
+        dash.run(tail_csv, args.tail, interval_ms=int(1000 / args.fps))
+    else:
+        host, port = args.socket.rsplit(':', 1)
+        dash.run(socket_source, host, int(port), interval_ms=int(1000 / args.fps))
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,9 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from decimation import plot_decimated
+from profiling import phase
+
 
 def butter_lowpass_filter(data, fs, cutoff, order=4):
     """Apply zero-phase Butterworth lowpass with filtfilt if available.
@@ -70,7 +73,8 @@ def main():
         print(f"CSV not found: {csv_path}. Try running from repository root or set --csv path relative to Plotting/")
         return
 
-    df = pd.read_csv(csv_path, skipinitialspace=True)
+    with phase('load'):
+        df = pd.read_csv(csv_path, skipinitialspace=True)
     if args.col not in df.columns:
         print(f"Column '{args.col}' not in CSV. Available columns: {list(df.columns)[:10]} ...")
         return
@@ -89,32 +93,35 @@ def main():
 
     # try SciPy butterworth, fallback to rolling mean
     use_scipy = True
-    try:
-        filtered = butter_lowpass_filter(x, fs, args.cutoff, order=args.order)
-    except Exception as e:
-        print('SciPy filtfilt not available or failed, falling back to rolling mean. Reason:', e)
-        use_scipy = False
-        window_sec = args.rolling_ms / 1000.0
-        window_samples = max(1, int(round(window_sec * fs)))
-        if window_samples % 2 == 0:
-            window_samples += 1
-        filtered = rolling_mean_filter(x, window_samples)
-        print(f'Rolling mean window samples: {window_samples}')
+    with phase('filter'):
+        try:
+            filtered = butter_lowpass_filter(x, fs, args.cutoff, order=args.order)
+        except Exception as e:
+            print('SciPy filtfilt not available or failed, falling back to rolling mean. Reason:', e)
+            use_scipy = False
+            window_sec = args.rolling_ms / 1000.0
+            window_samples = max(1, int(round(window_sec * fs)))
+            if window_samples % 2 == 0:
+                window_samples += 1
+            filtered = rolling_mean_filter(x, window_samples)
+            print(f'Rolling mean window samples: {window_samples}')
 
     # ensure output dir exists
     out_path = repo_plot_dir / args.output
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    plt.figure(figsize=(10, 6))
-    plt.plot(t, x, label=f'raw {args.col}', alpha=0.5)
-    plt.plot(t, filtered, label=f'lowpass {args.col} (cutoff={args.cutoff}Hz)' if use_scipy else f'rolling mean ({args.rolling_ms} ms)')
-    plt.xlabel('time (s)')
-    plt.ylabel(args.col)
-    plt.legend()
-    plt.title(f'Low-pass filter: {args.col}')
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig(out_path)
+    with phase('plot'):
+        # Series are reduced to the figure's pixel width before drawing
+        fig, ax = plt.subplots(figsize=(10, 6))
+        plot_decimated(ax, t, x, label=f'raw {args.col}', alpha=0.5)
+        plot_decimated(ax, t, filtered, label=f'lowpass {args.col} (cutoff={args.cutoff}Hz)' if use_scipy else f'rolling mean ({args.rolling_ms} ms)')
+        plt.xlabel('time (s)')
+        plt.ylabel(args.col)
+        plt.legend()
+        plt.title(f'Low-pass filter: {args.col}')
+        plt.grid(True)
+        plt.tight_layout()
+        plt.savefig(out_path)
     print('Saved plot to', out_path)
 
 
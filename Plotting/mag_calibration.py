@@ -0,0 +1,297 @@
+"""
+Batch hard/soft-iron magnetometer calibration.
+Usage: run from the repository root, e.g.
+
+    python Plotting/mag_calibration.py "Plotting/Data/*.csv" -o Plotting/Data/mag_calibration.json
+    python Plotting/mag_calibration.py "Plotting/Data/FT*_primary.csv" --per-state
+
+Follows VectorNav Resources/Hard-and-Soft-Iron-Calibration-VectorNav-TN002:
+raw readings of a constant field lie on an ellipsoid
+
+    (m - b)^T M (m - b) = 1
+
+where b is the hard-iron offset and M holds the soft-iron distortion.
+Once fitted, m_cal = W (m - b) lies on a sphere whose radius is the fitted
+field strength, so units are unchanged.
+
+Every flight (or flight x state segment with --per-state) is one item of a
+batch. The quadric is fitted with weighted least squares for the whole
+batch at once (one einsum for the normal equations, one batched pinv),
+starting from a trimmed sphere fit, and outliers are rejected by
+re-weighting samples whose calibrated radius is more than OUTLIER_MADS
+median absolute deviations from 1, for a few iterations. Corrections are
+applied in bulk to whole arrays, or chunk by chunk through
+MagCalibration.apply for streamed data.
+
+Column names: mag_x/mag_y/mag_z and accel_x/y/z for AltOS logs,
+IMU MagX/Y/Z and IMU AccelX/Y/Z for the drop logs.
+"""
+
+import argparse
+import glob
+import json
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from flight_states import StateIndex
+from profiling import phase
+
+MAG_COLUMNS = [('mag_x', 'mag_y', 'mag_z'), ('IMU MagX', 'IMU MagY', 'IMU MagZ')]
+ACCEL_COLUMNS = [('accel_x', 'accel_y', 'accel_z'), ('IMU AccelX', 'IMU AccelY', 'IMU AccelZ')]
+OUTLIER_MADS = 3.0  # Reject samples this many MADs away from the fitted sphere
+ROBUST_ITERATIONS = 3
+MIN_SAMPLES = 50
+
+
+def _columns(df, options):
+    for cols in options:
+        if all(c in df.columns for c in cols):
+            return list(cols)
+    return None
+
+
+def _design(m):
+    """Quadric design matrix for (..., n, 3) points: 9 columns, fitted against 1."""
+    x, y, z = m[..., 0], m[..., 1], m[..., 2]
+    return np.stack([x * x, y * y, z * z, 2 * y * z, 2 * x * z, 2 * x * y, 2 * x, 2 * y, 2 * z], axis=-1)
+
+
+def _nanmedian(x, axis):
+    """nanmedian that quietly returns NaN for rows with no samples."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(x, axis=axis)
+
+
+def _ellipsoid_from_quadric(theta):
+    """Center b, soft-iron W (onto a sphere of radius R) and R from (B, 9) quadric parameters.
+    Items whose quadric is not an ellipsoid come back as NaN.
+    """
+    a, b, c, f, g, h, p, q, r = np.moveaxis(theta, -1, 0)
+    A = np.stack([np.stack([a, h, g], -1), np.stack([h, b, f], -1), np.stack([g, f, c], -1)], -2)
+    v = np.stack([p, q, r], -1)
+
+    # pinv so one degenerate item (e.g. a planar spin) doesn't fail the batch
+    center = -(np.linalg.pinv(A) @ v[..., None])[..., 0]
+    k = 1 + np.einsum('bi,bij,bj->b', center, A, center)
+    finite = np.isfinite(k) & (np.abs(k) > 1e-12)
+    M = np.where(finite[:, None, None], A / np.where(finite, k, 1.0)[:, None, None], np.eye(3))
+
+    evals, evecs = np.linalg.eigh(M)
+    valid = finite & np.all(evals > 0, axis=1)
+    evals = np.where(valid[:, None], evals, np.nan)
+    # Geometric-mean radius keeps the calibrated field strength in sensor units
+    radius = np.prod(evals, axis=1) ** (-1 / 6)
+    W = np.einsum('bij,bj,bkj->bik', evecs, np.sqrt(evals), evecs) * radius[:, None, None]
+    return center, W, radius, valid
+
+
+def _sphere_fit(u, weights):
+    """Weighted least-squares sphere per item: |u|^2 = 2 c.u + k. Returns center, radius."""
+    A = np.concatenate([2 * u, np.ones(u.shape[:-1] + (1,))], axis=-1)
+    y = np.sum(u * u, axis=-1)
+    G = np.einsum('bn,bni,bnj->bij', weights, A, A)
+    rhs = np.einsum('bn,bni,bn->bi', weights, A, y)
+    sol = (np.linalg.pinv(G) @ rhs[..., None])[..., 0]
+    center = sol[:, :3]
+    radius = np.sqrt(np.maximum(sol[:, 3] + np.sum(center * center, axis=1), 0.0))
+    return center, radius
+
+
+def _inliers(u, mask, center, W):
+    """Calibrated radius of every sample (1 on a perfect fit) and the samples within OUTLIER_MADS."""
+    rad = np.linalg.norm(np.einsum('bij,bnj->bni', W, u - center[:, None, :]), axis=-1)
+    rad = np.where(mask, rad, np.nan)
+    # Degenerate items (no samples, zero radius) just come out as NaN / no inliers
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rad = rad / _nanmedian(rad, axis=1)[:, None]
+        dev = np.abs(rad - 1)
+        mad = _nanmedian(dev, axis=1)
+        keep = mask & (dev <= OUTLIER_MADS * 1.4826 * np.maximum(mad, 1e-9)[:, None])
+    return rad, keep
+
+
+def fit_ellipsoids(points, mask=None):
+    """Fit one ellipsoid per batch item.
+    points: (B, N, 3) array (items padded to the same N), mask: (B, N) bool of
+    real samples. Returns a dict of arrays: center (B, 3), W (B, 3, 3),
+    radius (B,), valid (B,), inliers (B,), residual_rms (B,).
+
+    The robust loop is seeded from a trimmed sphere fit,
+    since an unweighted quadric through gross outliers is often not an
+    ellipsoid at all. An iteration whose quadric is not an ellipsoid keeps
+    the previous solution and weights; an item that never gets a valid
+    ellipsoid keeps the sphere, i.e. a hard-iron-only correction.
+    """
+    points = np.asarray(points, dtype=float)
+    B, N, _ = points.shape
+    mask = np.ones((B, N), dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+    mask = mask & np.all(np.isfinite(points), axis=-1)
+
+    # Normalise each item for conditioning: u = (m - mu) / s. Medians, so
+    # gross outliers don't squash the real samples into a tiny ball
+    w0 = mask.astype(float)
+    masked = np.where(mask[..., None], points, np.nan)
+    mu = np.nan_to_num(_nanmedian(masked, axis=1))
+    u = np.where(mask[..., None], points - mu[:, None, :], 0.0)
+    s = np.nan_to_num(_nanmedian(np.where(mask, np.linalg.norm(u, axis=-1), np.nan), axis=1)) + 1e-12
+    u = u / s[:, None, None]
+
+    # Seed: trimmed sphere fit, W = I, radius in u units
+    W_u = np.broadcast_to(np.eye(3), (B, 3, 3)).copy()
+    keep = mask
+    for _ in range(ROBUST_ITERATIONS):
+        c_u, radius_u = _sphere_fit(u, keep.astype(float))
+        valid = radius_u > 0
+        rad, keep = _inliers(u, mask, c_u, W_u)
+        keep = keep & valid[:, None]
+
+    D = _design(u)
+    for _ in range(ROBUST_ITERATIONS + 1):
+        weights = keep.astype(float)
+        G = np.einsum('bn,bni,bnj->bij', weights, D, D)
+        rhs = np.einsum('bn,bni->bi', weights, D)
+        theta = (np.linalg.pinv(G) @ rhs[..., None])[..., 0]
+        c_new, W_new, r_new, ok = _ellipsoid_from_quadric(theta)
+
+        c_u = np.where(ok[:, None], c_new, c_u)
+        W_u = np.where(ok[:, None, None], W_new, W_u)
+        radius_u = np.where(ok, r_new, radius_u)
+        valid = valid | ok
+        rad_new, keep_new = _inliers(u, mask, c_u, W_u)
+        rad = np.where(ok[:, None], rad_new, rad)
+        keep = np.where(ok[:, None], keep_new, keep)
+
+    # Back to sensor units: m = s u + mu. W_u maps (u - c_u) onto a sphere
+    # of radius radius_u, so it maps (m - b) = s (u - c_u) onto radius_u * s
+    center = mu + s[:, None] * c_u
+    radius = radius_u * s
+    residual = np.sqrt(np.nansum(np.where(keep, (rad - 1) ** 2, 0.0), axis=1) / np.maximum(keep.sum(1), 1))
+
+    too_few = keep.sum(axis=1) < MIN_SAMPLES
+    valid = valid & ~too_few
+    return {
+        'center': np.where(valid[:, None], center, np.nan),
+        'W': np.where(valid[:, None, None], W_u, np.nan),
+        'radius': np.where(valid, radius, np.nan),
+        'valid': valid,
+        'inliers': keep.sum(axis=1),
+        'residual_rms': residual,
+    }
+
+
+class MagCalibration:
+    """One fitted hard/soft-iron correction."""
+
+    def __init__(self, center, W, radius=1.0):
+        self.center = np.asarray(center, dtype=float)
+        self.W = np.asarray(W, dtype=float)
+        self.radius = float(radius)
+
+    def apply(self, mag):
+        """Correct an (n, 3) array (or one chunk of a stream) in one matrix product."""
+        return (np.asarray(mag, dtype=float) - self.center) @ self.W.T
+
+    def to_dict(self):
+        return {'center': self.center.tolist(), 'W': self.W.tolist(), 'radius': self.radius}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['center'], d['W'], d.get('radius', 1.0))
+
+
+def heading(mag, accel=None):
+    """Magnetic heading in degrees [0, 360) for (n, 3) calibrated readings.
+    With accel the readings are tilt-compensated first (roll/pitch from the
+    gravity vector); without it the sensor is assumed level. Sensor frame:
+    x forward, y right, z down.
+    """
+    mag = np.asarray(mag, dtype=float)
+    mx, my, mz = mag[..., 0], mag[..., 1], mag[..., 2]
+    if accel is not None:
+        accel = np.asarray(accel, dtype=float)
+        ax, ay, az = accel[..., 0], accel[..., 1], accel[..., 2]
+        roll = np.arctan2(ay, az)
+        pitch = np.arctan2(-ax, np.hypot(ay, az))
+        cr, sr, cp, sp = np.cos(roll), np.sin(roll), np.cos(pitch), np.sin(pitch)
+        mx, my = mx * cp + my * sr * sp + mz * cr * sp, my * cr - mz * sr
+    return np.degrees(np.arctan2(-my, mx)) % 360.0
+
+
+def load_mag(csv_path, per_state=False):
+    """Magnetometer (and accel, if logged) samples of one log.
+    Returns a list of (label, mag (n, 3), accel (n, 3) or None) items.
+    """
+    df = pd.read_csv(csv_path, skipinitialspace=True)
+    mag_cols = _columns(df, MAG_COLUMNS)
+    if mag_cols is None:
+        return []
+    acc_cols = _columns(df, ACCEL_COLUMNS)
+    mag = df[mag_cols].to_numpy(float)
+    acc = df[acc_cols].to_numpy(float) if acc_cols else None
+    stem = Path(csv_path).stem
+
+    if not per_state:
+        return [(stem, mag, acc)]
+    items = []
+    for seg in StateIndex.from_frame(df, time_col=None):
+        sl = slice(seg.start, seg.end)
+        items.append((f"{stem}:{seg.state}", mag[sl], None if acc is None else acc[sl]))
+    return items
+
+
+def stack_items(arrays):
+    """Pad a list of (n_i, 3) arrays into (B, N, 3) with a (B, N) mask."""
+    N = max(len(a) for a in arrays)
+    points = np.zeros((len(arrays), N, 3))
+    mask = np.zeros((len(arrays), N), dtype=bool)
+    for i, a in enumerate(arrays):
+        points[i, :len(a)] = a
+        mask[i, :len(a)] = True
+    return points, mask
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit hard/soft-iron magnetometer calibrations over many logs at once')
+    parser.add_argument('patterns', nargs='+', help='Glob(s) of flight / drop-test CSVs')
+    parser.add_argument('--per-state', action='store_true', help='Fit every state segment separately')
+    parser.add_argument('-o', '--output', help='Save calibrations to this JSON file')
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.patterns for p in glob.glob(pattern)})
+    with phase('load'):
+        items = [it for p in paths for it in load_mag(p, args.per_state)]
+    items = [it for it in items if len(it[1]) >= MIN_SAMPLES]
+    if not items:
+        print(f"No magnetometer data in {args.patterns}")
+        return
+
+    with phase('fit'):
+        points, mask = stack_items([m for _, m, _ in items])
+        fits = fit_ellipsoids(points, mask)
+
+    calibrations = {}
+    print(f"{'item':<32} {'valid':>5} {'radius':>8} {'resid':>7} {'inliers':>8} {'heading std':>11}")
+    with phase('apply'):
+        for i, (label, mag, acc) in enumerate(items):
+            if not fits['valid'][i]:
+                print(f"{label:<32} {'no':>5}")
+                continue
+            cal = MagCalibration(fits['center'][i], fits['W'][i], fits['radius'][i])
+            calibrations[label] = cal.to_dict()
+            hdg = heading(cal.apply(mag), acc)
+            # Circular std of heading: a quick sanity check on the corrected data
+            spread = np.degrees(np.sqrt(-2 * np.log(np.abs(np.mean(np.exp(1j * np.radians(hdg)))))))
+            print(f"{label:<32} {'yes':>5} {fits['radius'][i]:>8.3f} {fits['residual_rms'][i]:>7.3f} "
+                  f"{fits['inliers'][i]:>8d} {spread:>11.1f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(calibrations, indent=2))
+        print('Saved calibrations to', args.output)
+
+
+if __name__ == '__main__':
+    main()
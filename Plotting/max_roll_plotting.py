@@ -4,7 +4,10 @@ import numpy as np
 from scipy.signal import savgol_filter
 from scipy.fft import fft, fftfreq, rfft, rfftfreq
 
+from profiling import checkpoint
+
 # --- Load CSV data ---
+checkpoint('load')
 df = pd.read_csv('Plotting\\Data\\FT1_primary.csv')
 if 'time' in df.columns:
     time_col = 'time'
@@ -15,6 +18,7 @@ else:
 df = df.set_index(time_col)
 df = df[~df.index.duplicated(keep='first')]
 
+checkpoint('resample')
 dt = 0.01
 t_new = np.arange(df.index.min(), df.index.max(), dt)
 df = df.reindex(df.index.union(t_new)).interpolate('index').loc[t_new]
@@ -47,11 +51,13 @@ roll = df_main[roll_col]
 
 print(time)
 
+checkpoint('filter')
 roll_smooth = savgol_filter(roll, window_length=20, polyorder=3)
 roll_dot = savgol_filter(roll, window_length=20, polyorder=3, deriv=1, delta=dt)
 
 print(max(roll_dot)*(np.pi/180)*1)
 
+checkpoint('fft')
 fft_vals = rfft(roll_dot)
 fft_freqs = rfftfreq(len(roll_dot), dt)
 fft_magnitude = np.abs(fft_vals) / len(roll_dot) * 2  # scale amplitude
@@ -59,6 +65,7 @@ fft_magnitude = np.abs(fft_vals) / len(roll_dot) * 2  # scale amplitude
 
 
 # Make subplots: 2 rows, 1 column
+checkpoint('plot')
 fig, ax = plt.subplots(3, 1, figsize=(8,6), sharex=True)
 
 # Plot roll
@@ -79,4 +86,5 @@ ax[2].plot(fft_freqs, fft_magnitude)
 
 #Tight layout for spacing
 plt.tight_layout()
+checkpoint(None)
 plt.show()
\ No newline at end of file
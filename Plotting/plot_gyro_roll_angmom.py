@@ -1,22 +1,11 @@
 #!/usr/bin/env python3
 import argparse
-from datetime import datetime, timezone
 import pandas as pd
 import matplotlib.pyplot as plt
 
-def build_datetime(row):
-    try:
-        return datetime(
-            int(row["year"]),
-            int(row["month"]),
-            int(row["day"]),
-            int(row["hour"]),
-            int(row["minute"]),
-            int(row["second"]),
-            tzinfo=timezone.utc,
-        )
-    except Exception:
-        return pd.NaT
+from decimation import plot_decimated
+from flight_states import StateIndex, build_timestamps
+from profiling import checkpoint
 
 def main():
     ap = argparse.ArgumentParser(description="Plot gyro_roll vs time from rocket CSV, showing flight states")
@@ -26,6 +15,7 @@ def main():
                     help="Use combined year/month/day/hour/minute/second as x-axis instead of the 'time' column")
     args = ap.parse_args()
 
+    checkpoint("load")
     df = pd.read_csv(args.csv, skipinitialspace=True, engine="python")
 
     needed = ["gyro_roll", "state_name"]
@@ -39,7 +29,7 @@ def main():
 
     # Prepare time axis
     if args.use_datetime:   # ✅ fixed underscore
-        x = df.apply(build_datetime, axis=1)
+        x = build_timestamps(df)
         x_label = "Timestamp (UTC)"
     else:
         x = df["time"]
@@ -49,33 +39,32 @@ def main():
     y = df["gyro_roll"]
 
      # Plot main line
+    checkpoint("plot")
     fig, ax = plt.subplots(figsize=(10, 5))
-    ax.plot(x, y, color="black", label="Gyro Roll")
+    plot_decimated(ax, x, y, color="black", label="Gyro Roll")
 
     # Add horizontal zero line
     ax.axhline(0, color="red", linestyle="--", linewidth=1, alpha=0.8, label="Zero Line")
 
-    # Identify where state changes
-    df["state_change"] = df["state_name"].ne(df["state_name"].shift())
-    change_indices = df.index[df["state_change"]].tolist()
-    change_indices.append(len(df) - 1)
+    # State segments (computed once, reused for the bands and the MAIN summary)
+    states = StateIndex.from_frame(df, state_col="state_name")
+    x_values = x.to_numpy()
+    label_y = y.max() * 0.95
 
     # Color palette for states
     colors = plt.cm.tab20.colors
     color_map = {}
     color_i = 0
 
-    for i in range(len(change_indices) - 1):
-        start = change_indices[i]
-        end = change_indices[i + 1]
-        state = df.loc[start, "state_name"]
-        color = color_map.setdefault(state, colors[color_i % len(colors)])
+    for seg in states:
+        color = color_map.setdefault(seg.state, colors[color_i % len(colors)])
         color_i += 1
 
-        x_start = x.iloc[start]
-        x_end = x.iloc[end]
+        # Bands run up to the first sample of the next segment so they touch
+        x_start = x_values[seg.start]
+        x_end = x_values[min(seg.end, len(x_values) - 1)]
         ax.axvspan(x_start, x_end, color=color, alpha=0.2)
-        ax.text((x_start + (x_end - x_start) / 2), max(y)*0.95, state,
+        ax.text((x_start + (x_end - x_start) / 2), label_y, seg.state,
                 ha="center", va="top", fontsize=8, color=color)
 
     ax.set_xlabel(x_label)
@@ -86,15 +75,18 @@ def main():
 
     if args.output:
         plt.savefig(args.output, dpi=150)
+        checkpoint(None)  # the plot phase includes rendering and export
         print(f"Saved plot to {args.output}")
     else:
+        checkpoint(None)  # don't time the blocking plt.show()
         # Print summary stats for main state
         if "state_name" in df.columns:
-            main_data = df[df["state_name"].str.lower().str.contains("main", na=False)]
-            if not main_data.empty:
+            main_rows = states.samples(lambda s: "main" in s.lower())
+            if len(main_rows):
+                main_roll = y.iloc[main_rows]
                 print("\n--- Main State Gyro Roll Summary ---")
-                print(main_data["gyro_roll"].describe())
-                mean_roll = main_data["gyro_roll"].mean()
+                print(main_roll.describe())
+                mean_roll = main_roll.mean()
                 print(f"\nAverage Gyro Roll during MAIN: {mean_roll:.3f}")
             else:
                 print("\nNo 'main' state found in data.")
@@ -0,0 +1,336 @@
+"""
+Profiling hooks shared by the Plotting scripts and the image pipeline.
+
+Off by default and free when off. Turn it on for any entry point with one
+environment variable:
+
+    ROLL_PROFILE=out.json python Plotting/max_roll_plotting.py
+    ROLL_PROFILE=1 python Plotting/batch_flight_analysis.py "Plotting/Data/*.csv"
+
+(ROLL_PROFILE=1 writes profile_<script>_<time>.json in the working directory.)
+The image pipeline picks the hooks up when this folder is importable:
+
+    PYTHONPATH=Plotting ROLL_PROFILE=1 python "Image Processing/main.py"
+
+For every named phase (load, resample, filter, FFT, plot, decode, stage N,
+...) the report has call count, wall and CPU time, and the tracemalloc peak
+memory reached inside the phase. cProfile runs on one in every
+ROLL_PROFILE_SAMPLE entries of each phase (default 1 = every entry) and the
+top functions per phase are stored in the same JSON.
+
+Instrumenting code:
+
+    from profiling import phase, checkpoint
+    with phase('filter'):
+        ...
+    checkpoint('load')     # flat scripts: ends the previous checkpoint phase
+    checkpoint('plot')     # and starts the next one, no re-indenting needed
+
+Comparing two runs:
+
+    python Plotting/profiling.py compare before.json after.json --threshold 10 --min-delta 0.05
+
+A phase is only flagged when it is both threshold % and min-delta seconds
+slower, so millisecond phases don't trip on timer noise.
+"""
+
+import argparse
+import atexit
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+ENV_VAR = 'ROLL_PROFILE'
+SAMPLE_ENV_VAR = 'ROLL_PROFILE_SAMPLE'
+TOP_FUNCTIONS = 15
+
+
+class Profiler:
+    """Collects per-phase timings for one process."""
+
+    def __init__(self, output, sample_every=1):
+        self.output = output
+        self.sample_every = max(1, sample_every)
+        self.phases = {}
+        self.profiles = {}
+        self.merged_profiles = {}  # top functions received from worker processes
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._checkpoint = None
+        # Only one cProfile profiler can be active at a time, so nested phases
+        # and phases running concurrently in other threads only get timings
+        self._cprofile_busy = False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def phase(self, name):
+        stack = self._stack()
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame = {'baseline': current, 'peak': current}
+        stack.append(frame)
+
+        with self._lock:
+            stats = self.phases.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                  'wall_max_s': 0.0, 'peak_kib': 0.0})
+            stats['calls'] += 1
+            sampled = (stats['calls'] - 1) % self.sample_every == 0
+
+        prof = None
+        if sampled:
+            with self._lock:
+                if not self._cprofile_busy:
+                    self._cprofile_busy = True
+                    prof = cProfile.Profile()
+            if prof is not None:
+                try:
+                    prof.enable()
+                except ValueError:
+                    # Another profiler (e.g. a debugger) is already active
+                    prof = None
+                    self._cprofile_busy = False
+
+        wall0, cpu0 = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall0
+            cpu = time.thread_time() - cpu0
+            if prof is not None:
+                prof.disable()
+                self._cprofile_busy = False
+            stack.pop()
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame['peak'])
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+
+            with self._lock:
+                stats['wall_s'] += wall
+                stats['cpu_s'] += cpu
+                stats['wall_max_s'] = max(stats['wall_max_s'], wall)
+                stats['peak_kib'] = max(stats['peak_kib'], (peak - frame['baseline']) / 1024)
+                if prof is not None:
+                    if name in self.profiles:
+                        self.profiles[name].add(prof)
+                    else:
+                        self.profiles[name] = pstats.Stats(prof)
+
+    def checkpoint(self, name):
+        if self._checkpoint is not None:
+            self._checkpoint.__exit__(None, None, None)
+            self._checkpoint = None
+        if name is not None:
+            self._checkpoint = self.phase(name)
+            self._checkpoint.__enter__()
+
+    def snapshot(self):
+        """Picklable copy of the collected data (for merging worker processes)."""
+        with self._lock:
+            return {'phases': {k: dict(v) for k, v in self.phases.items()},
+                    'cprofile': {k: _top_functions(v) for k, v in self.profiles.items()}}
+
+    def merge(self, snap):
+        with self._lock:
+            for name, other in snap['phases'].items():
+                stats = self.phases.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                      'wall_max_s': 0.0, 'peak_kib': 0.0})
+                stats['calls'] += other['calls']
+                stats['wall_s'] += other['wall_s']
+                stats['cpu_s'] += other['cpu_s']
+                stats['wall_max_s'] = max(stats['wall_max_s'], other['wall_max_s'])
+                stats['peak_kib'] = max(stats['peak_kib'], other['peak_kib'])
+            for name, rows in snap['cprofile'].items():
+                self.merged_profiles[name] = _sum_rows(self.merged_profiles.get(name, []), rows)
+
+    def report(self):
+        self.checkpoint(None)
+        snap = self.snapshot()
+        for name, rows in self.merged_profiles.items():
+            snap['cprofile'][name] = _sum_rows(snap['cprofile'].get(name, []), rows)
+        return {
+            'meta': {
+                'script': os.path.basename(sys.argv[0]) if sys.argv else '',
+                'argv': sys.argv[1:],
+                'started': self.started,
+                'python': platform.python_version(),
+                'sample_every': self.sample_every,
+            },
+            **snap,
+        }
+
+    def write(self):
+        with open(self.output, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"Profile written to {self.output}", file=sys.stderr)
+
+
+def _top_functions(stats, n=TOP_FUNCTIONS):
+    """Top n functions by cumulative time as a list of dicts."""
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({'function': f"{os.path.basename(filename)}:{line}({func})",
+                     'calls': nc, 'tottime_s': tt, 'cumtime_s': ct})
+    rows.sort(key=lambda r: r['cumtime_s'], reverse=True)
+    return rows[:n]
+
+
+def _sum_rows(*row_lists, n=TOP_FUNCTIONS):
+    """Combine top-function lists from several processes, summing per function."""
+    total = {}
+    for rows in row_lists:
+        for row in rows:
+            acc = total.setdefault(row['function'], {'function': row['function'], 'calls': 0,
+                                                     'tottime_s': 0.0, 'cumtime_s': 0.0})
+            acc['calls'] += row['calls']
+            acc['tottime_s'] += row['tottime_s']
+            acc['cumtime_s'] += row['cumtime_s']
+    return sorted(total.values(), key=lambda r: r['cumtime_s'], reverse=True)[:n]
+
+
+def _from_env():
+    value = os.environ.get(ENV_VAR)
+    if not value or value == '0':
+        return None
+    if value == '1':
+        script = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+        value = f"profile_{script}_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}.json"
+    return Profiler(value, int(os.environ.get(SAMPLE_ENV_VAR, '1')))
+
+
+_profiler = _from_env()
+_is_main_process = True
+
+
+def enabled():
+    return _profiler is not None
+
+
+@contextmanager
+def phase(name):
+    """Time a named phase (no-op unless ROLL_PROFILE is set)."""
+    if _profiler is None:
+        yield
+    else:
+        with _profiler.phase(name):
+            yield
+
+
+def checkpoint(name):
+    """End the current checkpoint phase and start phase name (None just ends it)."""
+    if _profiler is not None:
+        _profiler.checkpoint(name)
+
+
+def worker_init():
+    """ProcessPoolExecutor initializer: workers never write their own report.
+    Pass it as initializer= to every pool so spawned workers (Windows, macOS)
+    don't each leave a profile file or overwrite ROLL_PROFILE=out.json.
+    """
+    global _is_main_process
+    _is_main_process = False
+
+
+def in_worker(fn, *args, **kwargs):
+    """Run fn in a process-pool worker and return (result, profile snapshot or None).
+    The parent passes the snapshot to merge() so one report covers all workers.
+    """
+    worker_init()
+    if _profiler is None:
+        return fn(*args, **kwargs), None
+    _profiler.phases.clear()
+    _profiler.profiles.clear()
+    result = fn(*args, **kwargs)
+    return result, _profiler.snapshot()
+
+
+def merge(snap):
+    if _profiler is not None and snap is not None:
+        _profiler.merge(snap)
+
+
+@atexit.register
+def _write_at_exit():
+    if _profiler is not None and _is_main_process:
+        _profiler.write()
+
+
+def compare(before, after, threshold=10.0, min_delta=0.05):
+    """Print a per-phase comparison of two reports; returns the regressed phase names.
+    A phase regresses when its wall time grew by more than threshold % and
+    by more than min_delta seconds.
+    """
+    names = sorted(set(before['phases']) | set(after['phases']))
+    regressed = []
+    print(f"{'phase':<24} {'wall before':>12} {'wall after':>12} {'change':>8} "
+          f"{'cpu change':>10} {'peak KiB before':>16} {'peak KiB after':>15}")
+    for name in names:
+        b = before['phases'].get(name)
+        a = after['phases'].get(name)
+        if b is None or a is None:
+            b_wall = '-' if b is None else f"{b['wall_s']:.4f}"
+            a_wall = '-' if a is None else f"{a['wall_s']:.4f}"
+            print(f"{name:<24} {b_wall:>12} {a_wall:>12}  (only in one run)")
+            continue
+        wall = 100.0 * (a['wall_s'] - b['wall_s']) / b['wall_s'] if b['wall_s'] else 0.0
+        cpu = 100.0 * (a['cpu_s'] - b['cpu_s']) / b['cpu_s'] if b['cpu_s'] else 0.0
+        slower = a['wall_s'] - b['wall_s']
+        flag = '  <-- regression' if wall > threshold and slower > min_delta else ''
+        if flag:
+            regressed.append(name)
+        print(f"{name:<24} {b['wall_s']:>12.4f} {a['wall_s']:>12.4f} {wall:>+7.1f}% {cpu:>+9.1f}% "
+              f"{b['peak_kib']:>16.1f} {a['peak_kib']:>15.1f}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and compare ROLL_PROFILE reports')
+    sub = parser.add_subparsers(dest='command', required=True)
+    cmp_ = sub.add_parser('compare', help='Diff two profile reports phase by phase')
+    cmp_.add_argument('before')
+    cmp_.add_argument('after')
+    cmp_.add_argument('--threshold', type=float, default=10.0, help='Wall-time increase (%%) flagged as a regression (default 10)')
+    cmp_.add_argument('--min-delta', type=float, default=0.05,
+                      help='Smallest wall-time increase in seconds flagged as a regression (default 0.05)')
+    show = sub.add_parser('show', help='Print the hottest functions of each phase in one report')
+    show.add_argument('report')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        with open(args.before) as f:
+            before = json.load(f)
+        with open(args.after) as f:
+            after = json.load(f)
+        regressed = compare(before, after, args.threshold, args.min_delta)
+        sys.exit(1 if regressed else 0)
+
+    with open(args.report) as f:
+        report = json.load(f)
+    for name, stats in report['phases'].items():
+        print(f"\n== {name}: {stats['calls']} calls, {stats['wall_s']:.4f} s wall, "
+              f"{stats['cpu_s']:.4f} s CPU, peak {stats['peak_kib']:.1f} KiB")
+        for row in report['cprofile'].get(name, [])[:5]:
+            print(f"   {row['cumtime_s']:>9.4f} s  {row['calls']:>7}  {row['function']}")
+
+
+if __name__ == '__main__':
+    # Running the tool itself should never write a profile
+    _profiler = None
+    main()
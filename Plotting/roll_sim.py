@@ -0,0 +1,277 @@
+"""
+Vectorized Monte Carlo closed-loop roll simulator.
+Usage: run from the repository root, e.g.
+
+    python Plotting/roll_sim.py "Plotting/Data/Synthetic/*.csv" "Plotting/Data/FT*_primary.csv" -n 5000
+    python Plotting/roll_sim.py "Plotting/Data/Synthetic/*.csv" --sweep-kp 0.1 0.2 0.4 --sweep-kd 0.02 0.06
+
+Python stand-in for the roll-axis loop in simulink_model.slx. Every
+disturbance profile is one row of a 2D array and the whole batch is
+advanced one time step at a time, so thousands of runs cost about as much
+as one Python loop over the flight length.
+
+Model (roll axis only, SI units internally, °/s in the reported stats):
+  - rocket:   I_r * d(w_r)/dt = I_r * alpha_dist - tau
+  - wheel:    I_w * d(w_wa)/dt = tau - b_w * (w_wa - w_r)   (w_wa = absolute wheel speed)
+  - controller: outer PID on roll angle -> wheel torque command [N m],
+    as in simulink_model.slx. The inner torque loop of the "Motor +
+    Controller" block is taken as ideal, so the delivered torque is the
+    command clipped to T_max and to what the DC motor can produce at the
+    current wheel speed from V_supply (linear stall-torque / no-load-speed
+    curve). The Simulink model's 1.07 * T_ext feed-forward is left out:
+    in flight the disturbance is not known.
+
+Disturbances come from the generate_flight.py synthetic CSVs
+(time, roll_acceleration in °/s²) or from real FT logs, where the main
+phase roll acceleration is derived with the same Savitzky-Golay settings.
+The controller is any callable controller(t, roll_rate [rad/s],
+wheel_speed [rad/s, relative]) -> wheel torque command [N m] over arrays
+of shape (n_runs,); PID is the default.
+"""
+
+import argparse
+import glob
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.signal import savgol_filter
+
+from batch_flight_analysis import DT, SGF_POLYORDER, SGF_WINDOW, load_flight, main_phase, resample
+from flight_states import StateIndex
+from profiling import phase
+
+DEG = np.pi / 180
+
+
+class RollPlant:
+    """Physical parameters of the roll axis, rocket + reaction wheel + motor.
+    Defaults are the values in simulink_model.slx (I_payload, I_wheel, the
+    bearing friction gain and the "Motor + Controller" mask). Note that
+    simscape_motor.slx uses different inertias (0.006 payload, 0.003 wheel).
+    """
+
+    def __init__(self, I_r=0.003, I_w=0.0015, b_w=0.001, G=1.0, V_supply=12.0,
+                 T_stall=10.9, w_nl=182.0, T_max=1.65):
+        self.I_r = I_r            # rocket roll inertia [kg m²]
+        self.I_w = I_w            # wheel inertia [kg m²]
+        self.b_w = b_w            # wheel bearing viscous friction [N m s/rad]
+        self.G = G                # gear ratio, motor speed = G * wheel speed
+        self.V_supply = V_supply  # supply voltage [V]
+        self.T_stall = T_stall    # motor stall torque at V_supply [N m]
+        self.w_nl = w_nl          # motor no-load speed at V_supply [rad/s]
+        self.T_max = T_max        # wheel torque limit [N m]
+
+
+class PID:
+    """Vectorized PID on roll angle producing a wheel torque command.
+    Same structure and default gains as the outer PID Controller block of
+    simulink_model.slx: kp [N m/rad], ki [N m/(rad s)], kd [N m s/rad], with
+    the integral clamped to +-i_limit [rad s] like the block's integrator
+    saturation. The derivative term uses the measured roll rate directly
+    (no derivative filter). The roll angle is integrated from the rate, so
+    the setpoint is holding the angle at the start of the run.
+    Gains may be scalars or arrays of shape (n_runs,), which is how gain
+    sweeps are run in a single batch.
+    """
+
+    def __init__(self, kp=0.2, ki=0.05, kd=0.08, i_limit=1.0, dt=DT):
+        self.kp = np.asarray(kp, dtype=float)
+        self.ki = np.asarray(ki, dtype=float)
+        self.kd = np.asarray(kd, dtype=float)
+        self.i_limit = i_limit
+        self.dt = dt
+        self.angle = None
+        self.integral = None
+
+    def reset(self, n):
+        self.angle = np.zeros(n)
+        self.integral = np.zeros(n)
+
+    def __call__(self, t, roll_rate, wheel_speed):
+        self.angle += roll_rate * self.dt
+        self.integral = np.clip(self.integral + self.angle * self.dt, -self.i_limit, self.i_limit)
+        # Torque on the wheel; the rocket feels the reaction, -torque
+        return self.kp * self.angle + self.ki * self.integral + self.kd * roll_rate
+
+
+def load_profile(csv_path):
+    """Roll-acceleration disturbance (°/s²) on a DT grid from one CSV.
+    Returns (time, roll_accel, initial_roll_rate).
+    """
+    df = pd.read_csv(csv_path, skipinitialspace=True)
+    if 'roll_acceleration' in df.columns:
+        t, accel = resample(df['time'].to_numpy(float), df['roll_acceleration'].to_numpy(float))
+        return t, accel, 0.0
+
+    df = load_flight(csv_path)
+    main = main_phase(df, StateIndex.from_frame(df, state_col='state_name'))
+    t, roll = resample(main['time'].to_numpy(), main['roll'].to_numpy())
+    accel = savgol_filter(roll, window_length=min(SGF_WINDOW, len(roll)),
+                          polyorder=SGF_POLYORDER, deriv=1, delta=DT)
+    return t, accel, roll[0]
+
+
+def stack_profiles(profiles):
+    """Pad a list of 1D disturbance arrays with zeros into (n_profiles, n_steps).
+    Returns (array, lengths).
+    """
+    lengths = np.array([len(p) for p in profiles])
+    out = np.zeros((len(profiles), lengths.max()))
+    for i, p in enumerate(profiles):
+        out[i, :len(p)] = p
+    return out, lengths
+
+
+def monte_carlo_profiles(base, lengths, n, rng, scale_sigma=0.25, shift=True):
+    """Draw n disturbance profiles from the base set.
+    Each draw picks a base profile, scales it by a log-normal factor and
+    (optionally) circularly shifts it within its own length.
+    """
+    pick = rng.integers(0, len(base), n)
+    profiles = base[pick] * rng.lognormal(0.0, scale_sigma, n)[:, None]
+    lens = lengths[pick]
+    if shift:
+        cols = np.arange(base.shape[1])
+        offsets = rng.integers(0, lens)
+        src = (cols[None, :] + offsets[:, None]) % lens[:, None]
+        profiles = np.take_along_axis(profiles, src, axis=1)
+        profiles[cols[None, :] >= lens[:, None]] = 0.0
+    return profiles, lens, pick
+
+
+def simulate(disturbance, controller, plant=None, dt=DT, initial_rate=0.0, lengths=None,
+             settle_band=10.0, settle_dwell=1.0, record=False):
+    """Advance every run in disturbance (n_runs, n_steps) [°/s²] together.
+    Returns (stats DataFrame, traces). Stats are accumulated while stepping,
+    so memory stays O(n_runs) unless record=True, in which case traces is a
+    dict of (n_runs, n_steps) float32 arrays: roll_rate [°/s], wheel_speed
+    [rad/s, relative to the rocket], torque_cmd and torque [N m].
+
+    Steps past a run's length (if lengths is given) are excluded from its
+    stats. settle_band is in °/s: settling time is the time after which the
+    roll rate stays inside +-settle_band for the rest of the run. A run only
+    counts as settled if that lasts at least settle_dwell seconds before its
+    end; otherwise its settling time is NaN.
+    """
+    plant = plant or RollPlant()
+    n, steps = disturbance.shape
+    lengths = np.full(n, steps) if lengths is None else np.asarray(lengths)
+    if hasattr(controller, 'reset'):
+        controller.reset(n)
+
+    w_r = np.broadcast_to(np.asarray(initial_rate, dtype=float) * DEG, (n,)).copy()
+    w_wa = w_r.copy()  # wheel starts spinning with the rocket
+
+    peak = np.zeros(n)
+    sum_sq = np.zeros(n)
+    last_out = np.full(n, -1)
+    sat_count = np.zeros(n)
+    peak_wheel = np.zeros(n)
+
+    traces = None
+    if record:
+        traces = {k: np.zeros((n, steps), dtype=np.float32)
+                  for k in ('roll_rate', 'wheel_speed', 'torque_cmd', 'torque')}
+
+    for k in range(steps):
+        w_rel = w_wa - w_r
+        cmd = controller(k * dt, w_r, w_rel)
+
+        # Motor torque available at this speed with +-V_supply across it
+        w_motor = plant.G * w_rel
+        lo = plant.G * plant.T_stall * (-1 - w_motor / plant.w_nl)
+        hi = plant.G * plant.T_stall * (1 - w_motor / plant.w_nl)
+        torque = np.clip(np.clip(cmd, lo, hi), -plant.T_max, plant.T_max)
+
+        w_wa = w_wa + (torque - plant.b_w * w_rel) / plant.I_w * dt
+        w_r = w_r + (disturbance[:, k] * DEG - torque / plant.I_r) * dt
+
+        active = k < lengths
+        rate = np.abs(w_r) / DEG
+        peak = np.where(active, np.maximum(peak, rate), peak)
+        sum_sq += np.where(active, rate ** 2, 0.0)
+        last_out = np.where(active & (rate > settle_band), k, last_out)
+        sat_count += active & (torque != cmd)
+        peak_wheel = np.where(active, np.maximum(peak_wheel, np.abs(w_wa - w_r)), peak_wheel)
+
+        if record:
+            traces['roll_rate'][:, k] = w_r / DEG
+            traces['wheel_speed'][:, k] = w_wa - w_r
+            traces['torque_cmd'][:, k] = cmd
+            traces['torque'][:, k] = torque
+
+    dwell = int(round(settle_dwell / dt))
+    settling = np.where(last_out + 1 + dwell > lengths, np.nan, (last_out + 1) * dt)
+    result = pd.DataFrame({
+        'peak_roll_rate': peak,
+        'rms_roll_rate': np.sqrt(sum_sq / lengths),
+        'settling_time_s': settling,
+        'saturation_frac': sat_count / lengths,
+        'peak_wheel_speed': peak_wheel,
+    })
+    return result, traces
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo closed-loop roll simulation over disturbance profiles')
+    parser.add_argument('patterns', nargs='+', help='Glob(s) of synthetic roll-accel CSVs and/or FT flight logs')
+    parser.add_argument('-n', '--runs', type=int, default=1000, help='Monte Carlo runs per gain set (default 1000)')
+    parser.add_argument('--kp', type=float, default=0.2, help='Roll angle gain [N m/rad] (default 0.2)')
+    parser.add_argument('--ki', type=float, default=0.05, help='Integral gain [N m/(rad s)] (default 0.05)')
+    parser.add_argument('--kd', type=float, default=0.08, help='Roll rate gain [N m s/rad] (default 0.08)')
+    parser.add_argument('--sweep-kp', type=float, nargs='+', help='Sweep these kp values (overrides --kp)')
+    parser.add_argument('--sweep-kd', type=float, nargs='+', help='Sweep these kd values (overrides --kd)')
+    parser.add_argument('--settle-band', type=float, default=10.0, help='Settling band in °/s (default 10)')
+    parser.add_argument('--settle-dwell', type=float, default=1.0,
+                        help='Time the roll rate must stay in the band to count as settled, s (default 1)')
+    parser.add_argument('--seed', type=int, default=0, help='RNG seed (default 0)')
+    parser.add_argument('-o', '--output', help='Save per-run stats to this CSV')
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.patterns for p in glob.glob(pattern)})
+    if not paths:
+        print(f"No files matched {args.patterns}")
+        return
+
+    with phase('load'):
+        profiles = [load_profile(p) for p in paths]
+    base, lengths = stack_profiles([accel for _, accel, _ in profiles])
+    initial = np.array([rate0 for _, _, rate0 in profiles])
+    print(f"Loaded {len(paths)} disturbance profiles, longest {lengths.max() * DT:.1f} s")
+
+    kps = args.sweep_kp or [args.kp]
+    kds = args.sweep_kd or [args.kd]
+    grid_kp, grid_kd = [g.ravel() for g in np.meshgrid(kps, kds, indexing='ij')]
+    n_sets = len(grid_kp)
+
+    # One batch: every gain set sees the same n Monte Carlo draws
+    rng = np.random.default_rng(args.seed)
+    draws, lens, pick = monte_carlo_profiles(base, lengths, args.runs, rng)
+    disturbance = np.tile(draws, (n_sets, 1))
+    controller = PID(np.repeat(grid_kp, args.runs), args.ki, np.repeat(grid_kd, args.runs))
+
+    with phase('simulate'):
+        df, _ = simulate(disturbance, controller, initial_rate=np.tile(initial[pick], n_sets),
+                         lengths=np.tile(lens, n_sets), settle_band=args.settle_band,
+                         settle_dwell=args.settle_dwell)
+    df.insert(0, 'kd', np.repeat(grid_kd, args.runs))
+    df.insert(0, 'kp', np.repeat(grid_kp, args.runs))
+    df.insert(2, 'profile', [Path(paths[i]).stem for i in np.tile(pick, n_sets)])
+
+    summary = df.groupby(['kp', 'kd']).agg(
+        peak_roll_rate_p95=('peak_roll_rate', lambda s: s.quantile(0.95)),
+        rms_roll_rate=('rms_roll_rate', 'mean'),
+        settling_time_s=('settling_time_s', 'median'),
+        never_settled=('settling_time_s', lambda s: s.isna().mean()),
+        saturation_frac=('saturation_frac', 'mean'),
+    )
+    print(summary.to_string(float_format=lambda v: f'{v:.3f}'))
+
+    if args.output:
+        df.to_csv(args.output, index=False)
+        print('Saved per-run stats to', args.output)
+
+
+if __name__ == '__main__':
+    main()
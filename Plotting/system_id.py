@@ -0,0 +1,249 @@
+"""
+Batch system identification for roll and motor dynamics.
+Usage: run from the repository root, e.g.
+
+    python Plotting/system_id.py "Plotting/Data/3_15_drop_*.csv" --order 2 --boot 2000
+    python Plotting/system_id.py "Plotting/Data/FT*_primary.csv" --input none --output gyro_roll --state main
+
+Python counterpart of Simulink/system_id.slx and motor_scoping.slx, but
+fitting every log and state segment together instead of one dataset at a
+time. Each segment is resampled to DT and turned into an ARX regressor
+(Hankel) matrix; the matrices are stacked and solved with one least squares.
+
+    y[k] = -a1 y[k-1] - ... - a_na y[k-na] + b1 u[k-nk] + ... + b_nb u[k-nk-nb+1]
+
+--order 1 / 2 fits ARX(1,1) / ARX(2,2) and converts it to a continuous
+first-order (K, tau) or second-order (K, wn, zeta) model. With --input none
+the input terms are dropped (pure AR model of the roll rate).
+
+Confidence intervals come from a moving-block bootstrap: blocks are every
+overlapping window of --block rows that lies inside one segment (a shorter
+segment is one block), so no block straddles two segments or two logs.
+The Gram matrices of all blocks come from one cumulative sum, so each
+bootstrap replicate is just a sum of drawn block Grams and a p x p
+pseudo-inverse solve; replicates are split into fixed chunks with their
+own seeds and run in a process pool, so results are identical for a given
+--seed whatever the worker count.
+"""
+
+import argparse
+import glob
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from batch_flight_analysis import DT, resample
+from flight_states import StateIndex
+import profiling
+from profiling import phase
+
+BOOT_CHUNK = 500  # Bootstrap replicates per task
+
+
+def load_segments(csv_path, input_col='PWM', output_col='IMU AngVeloY', state=None, min_samples=50):
+    """Split one log into per-state segments resampled to DT.
+    Returns a list of dicts with keys flight, state, u, y (u is None if input_col is None).
+    """
+    df = pd.read_csv(csv_path, skipinitialspace=True)
+    time_col = 'time' if 'time' in df.columns else 'Time (ms)'
+    df = df.drop_duplicates(time_col, keep='first').sort_values(time_col, kind='stable').reset_index(drop=True)
+    states = StateIndex.from_frame(df, time_col=time_col)
+
+    t_all = df[time_col].to_numpy(float)
+    y_all = df[output_col].to_numpy(float)
+    u_all = df[input_col].to_numpy(float) if input_col else None
+
+    segments = []
+    for seg in states.segments(state):
+        if seg.end - seg.start < min_samples:
+            continue
+        t = t_all[seg.start:seg.end]
+        _, y = resample(t, y_all[seg.start:seg.end])
+        u = resample(t, u_all[seg.start:seg.end])[1] if u_all is not None else None
+        segments.append({'flight': Path(csv_path).stem, 'state': seg.state, 'u': u, 'y': y})
+    return segments
+
+
+def regressors(y, u=None, na=1, nb=1, nk=1):
+    """ARX regressor matrix Phi and target vector for one segment.
+    Built from sliding-window (Hankel) views, no Python loop over samples.
+    """
+    lag = max(na, nk + nb - 1 if u is not None else 0)
+    n = len(y) - lag
+    if n <= 0:
+        return np.empty((0, na + (nb if u is not None else 0))), np.empty(0)
+
+    # Column j of the window view is y[k - lag + j]; reverse so column 0 is y[k-1]
+    y_lags = sliding_window_view(y[:-1], lag)[:, ::-1][:, :na]
+    cols = [-y_lags]
+    if u is not None:
+        u_lags = sliding_window_view(u[:-1], lag)[:, ::-1]
+        cols.append(u_lags[:, nk - 1:nk - 1 + nb])
+    return np.hstack(cols), y[lag:]
+
+
+def stack(segments, na, nb, nk):
+    """Stack the regressors of every segment (never across segment boundaries).
+    Returns (phi, target, lengths) with the number of rows of each segment.
+    """
+    parts = [regressors(s['y'], s['u'], na, nb, nk) for s in segments]
+    lengths = np.array([len(p[1]) for p in parts])
+    return np.vstack([p[0] for p in parts]), np.concatenate([p[1] for p in parts]), lengths
+
+
+def fit_arx(phi, target):
+    """Least-squares ARX parameters [a1..a_na, b1..b_nb] and residual std."""
+    theta, *_ = np.linalg.lstsq(phi, target, rcond=None)
+    resid = target - phi @ theta
+    return theta, np.std(resid)
+
+
+def fit_each(segments, na, nb, nk):
+    """Fit every segment separately with one batched solve of the normal equations.
+    Returns an array of shape (n_segments, na + nb). A pseudo-inverse is used
+    so one badly excited segment (e.g. constant PWM) doesn't fail the batch.
+    """
+    parts = [regressors(s['y'], s['u'], na, nb, nk) for s in segments]
+    gram = np.stack([p.T @ p for p, _ in parts])
+    rhs = np.stack([p.T @ t for p, t in parts])
+    return (np.linalg.pinv(gram) @ rhs[..., None])[..., 0]
+
+
+def to_continuous(theta, na, dt=DT, has_input=True):
+    """Convert ARX(1,1) / ARX(2,2) parameters to continuous-time model parameters.
+    Works on a single theta or on a batch of shape (n, p).
+    """
+    theta = np.atleast_2d(theta)
+    a = theta[:, :na]
+    b = theta[:, na:] if has_input else np.zeros((len(theta), 1))
+    dc_gain = b.sum(axis=1) / (1 + a.sum(axis=1))
+
+    if na == 1:
+        pole = -a[:, 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tau = -dt / np.log(pole)
+        out = {'tau': tau}
+    elif na == 2:
+        # z^2 + a1 z + a2 = 0, mapped to s = ln(z) / dt
+        disc = (a[:, 0] ** 2 - 4 * a[:, 1]).astype(complex)
+        z = (-a[:, 0] + np.sqrt(disc)) / 2
+        z2 = (-a[:, 0] - np.sqrt(disc)) / 2
+        s1, s2 = np.log(z) / dt, np.log(z2) / dt
+        wn = np.sqrt(np.abs(s1 * s2))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            zeta = -(s1 + s2).real / (2 * wn)
+        out = {'wn': wn, 'zeta': zeta}
+    else:
+        out = {}
+    if has_input:
+        out['K'] = dc_gain
+    return {k: v if v.shape[0] > 1 else v[0] for k, v in out.items()}
+
+
+def block_grams(phi, target, block, lengths=None):
+    """Gram matrices (n_blocks, p, p) and right-hand sides (n_blocks, p) of every
+    overlapping window of block rows that lies inside one segment.
+    lengths are the segment row counts from stack() (default: one segment);
+    a segment shorter than block is a single block.
+    Also returns the number of rows in each block.
+    """
+    lengths = np.array([len(target)]) if lengths is None else np.asarray(lengths)
+    p = phi.shape[1]
+    # Block sums as differences of cumulative sums of the per-row products
+    cum_g = np.concatenate([np.zeros((1, p, p)), np.cumsum(np.einsum('ki,kj->kij', phi, phi), axis=0)])
+    cum_r = np.concatenate([np.zeros((1, p)), np.cumsum(phi * target[:, None], axis=0)])
+
+    offsets = np.r_[0, np.cumsum(lengths)[:-1]]
+    starts = [off + np.arange(n - block + 1) if n >= block else np.array([off])
+              for off, n in zip(offsets, lengths) if n > 0]
+    ends = [st + min(block, n) for st, n in zip(starts, lengths[lengths > 0])]
+    starts, ends = np.concatenate(starts), np.concatenate(ends)
+    return cum_g[ends] - cum_g[starts], cum_r[ends] - cum_r[starts], ends - starts
+
+
+def _bootstrap_chunk(grams, rhs, n_draws, n, seed):
+    rng = np.random.default_rng(seed)
+    draws = rng.integers(0, len(grams), (n, n_draws))
+    g = grams[draws].sum(axis=1)
+    r = rhs[draws].sum(axis=1)
+    # pinv so a singular replicate (e.g. only constant-PWM blocks) doesn't fail the chunk
+    return (np.linalg.pinv(g) @ r[..., None])[..., 0]
+
+
+def bootstrap(phi, target, n_boot=1000, block=200, seed=0, workers=None, lengths=None):
+    """Moving-block bootstrap of the pooled ARX fit.
+    Each replicate draws overlapping blocks (see block_grams) with replacement
+    until it has about as many rows as the data. Returns an array of shape
+    (n_boot, p) of parameter replicates.
+    """
+    grams, rhs, sizes_b = block_grams(phi, target, block, lengths)
+    n_draws = max(1, int(round(len(target) / sizes_b.mean())))
+    sizes = [min(BOOT_CHUNK, n_boot - i) for i in range(0, n_boot, BOOT_CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    with ProcessPoolExecutor(max_workers=workers, initializer=profiling.worker_init) as pool:
+        chunks = pool.map(_bootstrap_chunk, [grams] * len(sizes), [rhs] * len(sizes),
+                          [n_draws] * len(sizes), sizes, seeds)
+        return np.vstack(list(chunks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit ARX / first- or second-order roll and motor models over many logs')
+    parser.add_argument('patterns', nargs='+', help='Glob(s) of flight or drop-test CSVs')
+    parser.add_argument('--input', default='PWM', help="Input column, or 'none' for an AR model (default PWM)")
+    parser.add_argument('--output', default='IMU AngVeloY', help='Output column (default IMU AngVeloY)')
+    parser.add_argument('--state', help='Only use segments in this state (default: all segments)')
+    parser.add_argument('--order', type=int, choices=[1, 2], default=1, help='Model order (default 1)')
+    parser.add_argument('--nk', type=int, default=1, help='Input delay in samples (default 1)')
+    parser.add_argument('--boot', type=int, default=1000, help='Bootstrap replicates, 0 to skip (default 1000)')
+    parser.add_argument('--block', type=int, default=200, help='Bootstrap block length in samples (default 200)')
+    parser.add_argument('--seed', type=int, default=0, help='Bootstrap seed (default 0)')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('-o', '--save', help='Save per-segment fits to this CSV')
+    args = parser.parse_args()
+
+    input_col = None if args.input.lower() == 'none' else args.input
+    na = nb = args.order
+
+    paths = sorted({p for pattern in args.patterns for p in glob.glob(pattern)})
+    with phase('load'):
+        segments = [s for p in paths for s in load_segments(p, input_col, args.output, args.state)]
+    if not segments:
+        print(f"No usable segments in {args.patterns}")
+        return
+    print(f"Fitting ARX({na},{nb if input_col else 0}) over {len(segments)} segments from {len(paths)} logs")
+
+    with phase('fit'):
+        phi, target, lengths = stack(segments, na, nb, args.nk)
+        theta, sigma = fit_arx(phi, target)
+    params = to_continuous(theta, na, has_input=input_col is not None)
+    print(f"Pooled fit: theta = {np.round(theta, 5)}, residual std = {sigma:.3f}")
+    if args.boot:
+        with phase('bootstrap'):
+            reps = bootstrap(phi, target, args.boot, args.block, args.seed, args.workers, lengths)
+        boot_params = to_continuous(reps, na, has_input=input_col is not None)
+    for name, value in params.items():
+        line = f"  {name:>5} = {value:.5g}"
+        if args.boot:
+            lo, hi = np.nanpercentile(boot_params[name], [2.5, 97.5])
+            line += f"  (95% CI {lo:.5g} .. {hi:.5g}, {args.boot} moving-block bootstrap)"
+        print(line)
+
+    if args.save:
+        each = fit_each(segments, na, nb, args.nk)
+        cont = to_continuous(each, na, has_input=input_col is not None)
+        df = pd.DataFrame({'flight': [s['flight'] for s in segments],
+                           'state': [s['state'] for s in segments],
+                           'samples': [len(s['y']) for s in segments]})
+        for i in range(each.shape[1]):
+            df[f'theta_{i}'] = each[:, i]
+        for name, value in cont.items():
+            df[name] = value
+        df.to_csv(args.save, index=False)
+        print('Saved per-segment fits to', args.save)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Checks for flight_catalog.FlightCatalog on the shipped drop log.
+Usage: run from the repository root with
+
+    python -m pytest Plotting/test_flight_catalog.py
+"""
+
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from flight_catalog import FlightCatalog
+
+DROP_LOG = Path(__file__).resolve().parent / 'Data' / '3_15_drop_1.csv'
+
+
+def test_long_flight_id_round_trips(tmp_path):
+    # Longer than the 32-character default width of the flight field
+    csv = tmp_path / '3_15_drop_test_rig_second_attempt_repeat.csv'
+    shutil.copy(DROP_LOG, csv)
+    catalog = FlightCatalog(tmp_path / 'catalog')
+    fid = catalog.ingest(csv)
+    assert fid == csv.stem
+
+    hits = catalog.segments(flight=fid)
+    assert len(hits) > 0
+    assert set(hits['flight']) == {fid}
+    data = catalog.read_segment(hits[0], ['time'])
+    assert len(data['time']) == hits[0]['end'] - hits[0]['start']
+
+    # Reopened from disk, and re-ingested with force: segments are replaced, not duplicated
+    catalog = FlightCatalog(tmp_path / 'catalog')
+    n_segments = len(catalog.segment_table)
+    catalog.ingest(csv, force=True)
+    assert len(catalog.segment_table) == n_segments
+    assert np.array_equal(catalog.segments(flight=fid)['start'], hits['start'])
@@ -0,0 +1,71 @@
+"""
+Checks for mag_calibration.fit_ellipsoids on synthetic hard/soft-iron data.
+Usage: run from the repository root with
+
+    python -m pytest Plotting/test_mag_calibration.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mag_calibration import fit_ellipsoids, MagCalibration, stack_items
+
+
+def synthetic_items(n_items=50, n_samples=600, outlier_frac=0.0, seed=0):
+    """Random ellipsoids around random offsets; returns (items, true centers, field strengths)."""
+    rng = np.random.default_rng(seed)
+    items, centers, fields = [], [], []
+    for _ in range(n_items):
+        field = rng.uniform(0.3, 0.6)
+        direction = rng.normal(size=(n_samples, 3))
+        direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+        # Soft iron: random symmetric positive-definite distortion near identity
+        q, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+        soft = q @ np.diag(rng.uniform(0.7, 1.3, 3)) @ q.T
+        center = rng.uniform(-0.5, 0.5, 3)
+        m = field * direction @ soft.T + center + rng.normal(scale=0.002, size=(n_samples, 3))
+
+        n_out = int(outlier_frac * n_samples)
+        if n_out:
+            bad = rng.choice(n_samples, n_out, replace=False)
+            m[bad] = center + rng.uniform(-10, 10, size=(n_out, 3)) * field
+        items.append(m)
+        centers.append(center)
+        fields.append(field)
+    return items, np.array(centers), np.array(fields)
+
+
+def check_fits(outlier_frac):
+    items, centers, _ = synthetic_items(outlier_frac=outlier_frac)
+    points, mask = stack_items(items)
+    fits = fit_ellipsoids(points, mask)
+
+    assert fits['valid'].all()
+    assert np.all(fits['inliers'] >= 0.9 * (1 - outlier_frac) * len(items[0]))
+    assert np.allclose(fits['center'], centers, atol=0.02)
+    for i, m in enumerate(items):
+        cal = MagCalibration(fits['center'][i], fits['W'][i], fits['radius'][i])
+        r = np.linalg.norm(cal.apply(m), axis=1) / fits['radius'][i]
+        # Most samples (the clean ones) end up on the sphere
+        assert np.median(np.abs(r - 1)) < 0.02
+
+
+def test_clean_ellipsoids():
+    check_fits(0.0)
+
+
+def test_ellipsoids_with_outliers():
+    check_fits(0.02)
+
+
+def test_degenerate_item_does_not_fail_batch():
+    items, _, _ = synthetic_items(n_items=2)
+    items.append(np.zeros((600, 3)))  # sensor stuck at zero
+    points, mask = stack_items(items)
+    fits = fit_ellipsoids(points, mask)
+    assert fits['valid'][:2].all()
+    assert not fits['valid'][2]